@@ -14,11 +14,26 @@ from JSONTranscriptionParser import json_to_text
 from detect_naturecode import run_detection
 import ollama
 
+# EMSQA.csv is resolved from this file so the grader works from any working directory
+QUESTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "EMSQA.csv")
+
 # Configure Ollama client to use environment variable if set
 # The ollama Python client automatically uses OLLAMA_HOST env var
 # Defaults to http://localhost:11434 if not set
 ollama_host = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
 
+# Model and generation options used for grading (both are part of the grade cache key)
+GRADING_MODEL = 'llama3.1:8b'
+GRADING_OPTIONS = {
+    'temperature': 0.1,  # Lower temperature for more consistent responses
+    'top_p': 0.9,        # Slightly more focused responses
+    'num_predict': 500,  # Limit response length
+    'timeout': 120       # 2 minute timeout
+}
+
+# Bump whenever the grading prompt below changes, so grades cached with the old prompt are never served
+PROMPT_VERSION = "1"
+
 # Global variable to track Ollama initialization status
 _ollama_initialized = False
 
@@ -74,41 +89,19 @@ def initialize_ollama():
         print(f"Warning: Failed to preload Ollama model: {e}")
         print("Grading requests may be slow on first use.")
 
-# Function for gathering nature codes and cleaning up file structure afterwards
+# Function for gathering nature codes (no log file is written)
 
-# Input: path to a transcript, transcript text
-# Output: nature codes
-def detect_nature_codes_in_memory(transcript_path, transcript_text):
-    temp_path = run_detection(transcript_path, transcript_text)
-    with open(temp_path, 'r') as f:
-        nature_codes = f.read()
-    os.remove(temp_path)
-    return nature_codes
+# Input: transcript text
+# Output: DetectionResult
+def detect_nature_codes_in_memory(transcript_text):
+    return run_detection(None, transcript_text)
 
 # Function for extracting nature codes and sorting by confidence
 
-# Input: nature codes text
-# Output: array of nature code from most to least confident
-def extract_all_nature_codes(text):
-    nature_codes = []
-    lines = text.strip().split('\n')
-    
-    for i, line in enumerate(lines):
-        if line.strip().startswith('- '):
-            nature_code = line.strip()[2:].split(' (')[0]
-            
-            if i + 2 < len(lines):
-                confidence_line = lines[i + 2].strip()
-                if confidence_line.startswith('Confidence:'):
-                    try:
-                        confidence = float(confidence_line.split(': ')[1])
-                        nature_codes.append((nature_code, confidence))
-                    except (IndexError, ValueError):
-                        continue
-    
-    # Sort by confidence (highest first)
-    nature_codes.sort(key=lambda x: x[1], reverse=True)
-    return nature_codes
+# Input: DetectionResult
+# Output: array of (nature code, confidence) from most to least confident
+def extract_all_nature_codes(detection):
+    return detection.ranked()
 
 # Function for loading specific nature code questions
 
@@ -116,7 +109,7 @@ def extract_all_nature_codes(text):
 # Output: dict of questions from given nature code
 def load_nature_code_questions(nature_code):
     try:
-        df = pd.read_csv("data/EMSQA.csv")
+        df = pd.read_csv(QUESTIONS_PATH)
         nature_questions = df[df['NatureCode'] == nature_code]
         
         questions_dict = {}
@@ -135,7 +128,7 @@ def load_nature_code_questions(nature_code):
     
     # Error handling
     except FileNotFoundError:
-        print(f"Error: EMSQA.csv file not found in data/ directory")
+        print(f"Error: EMSQA.csv file not found at {QUESTIONS_PATH}")
         return {}
     except Exception as e:
         print(f"Error loading questions for Nature Code {nature_code}: {e}")
@@ -231,14 +224,9 @@ Important: Be accurate and return valid JSON only."""
     try:
         # Add timeout and optimize generation parameters for faster response
         response = ollama.generate(
-            model='llama3.1:8b',
+            model=GRADING_MODEL,
             prompt=prompt,
-            options={
-                'temperature': 0.1,  # Lower temperature for more consistent responses
-                'top_p': 0.9,        # Slightly more focused responses
-                'num_predict': 500,  # Limit response length
-                'timeout': 120       # 2 minute timeout
-            }
+            options=GRADING_OPTIONS
         )
         # Extract JSON from response
         import json
@@ -282,13 +270,12 @@ def main():
         sys.exit(1)
 
     # Get nature codes
-    nature_codes_text = detect_nature_codes_in_memory(sys.argv[1], transcript)
-    if not nature_codes_text:
+    detection = detect_nature_codes_in_memory(transcript)
+    nature_codes = extract_all_nature_codes(detection)
+    if not nature_codes:
         print(f"Error: Could not determine nature codes")
         sys.exit(1)
 
-    nature_codes = extract_all_nature_codes(nature_codes_text)
-
     # Grade based on nature code with highest confidence
     primary_nature_code = nature_codes[0][0]
 
@@ -32,12 +32,20 @@ def json_to_text(file_path):
         # Any other possible error
         print(f"Error reading file: {e}")
         return ""
-    
+
+    return dict_to_text(data)
+
+# Function for parsing an already loaded Json transcription (same format as json_to_text)
+
+# Input: Transcription dictionary with 'segments' array
+# Output: Plain text in above format
+def dict_to_text(data):
+
     # Initialize string variable for storing output
     text_output = ""
     
     # Check if the JSON has the expected structure
-    if 'segments' in data and isinstance(data['segments'], list):
+    if isinstance(data, dict) and 'segments' in data and isinstance(data['segments'], list):
         # For each message entry...
         for segment in data['segments']:
             # Extract the required fields
@@ -60,7 +68,7 @@ def json_to_text(file_path):
             text_output += f"[{start_timestamp}–{end_timestamp}] {speaker}: {transcript_text}\n"
     else:
         # Incorrect structure
-        print("Error: JSON file does not contain 'segments' array or has unexpected structure.")
+        print("Error: JSON does not contain 'segments' array or has unexpected structure.")
         return ""
     
     # Return fully parsed transcript as a string
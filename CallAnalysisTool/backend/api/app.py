@@ -17,7 +17,9 @@ from flask_cors import CORS
 from api.routes.grading import grading_bp
 from api.routes.health import health_bp
 from api.routes.transcription import transcription_bp, initialize_transcriber
+from api.routes.streaming import streaming_bp
 from AIGrader import initialize_ollama
+from detect_naturecode import warmup_detector
 
 def create_app():
     """Application factory pattern"""
@@ -37,6 +39,7 @@ def create_app():
     app.register_blueprint(health_bp, url_prefix='/api')
     app.register_blueprint(grading_bp, url_prefix='/api')
     app.register_blueprint(transcription_bp, url_prefix='/api')
+    app.register_blueprint(streaming_bp, url_prefix='/api')
 
     # In containerized environment, defer model initialization to avoid startup issues
     # Models will be initialized on first request if not already loaded
@@ -47,6 +50,9 @@ def create_app():
 
             # Initialize Ollama (Preloads the llama3.1:8b model)
             initialize_ollama()
+
+            # Load the nature code keywords and embedding model before the first grading request
+            warmup_detector()
         except Exception as e:
             print(f"Warning: Model initialization failed at startup: {e}")
             print("Models will be initialized on first request.")
@@ -64,6 +70,7 @@ if __name__ == '__main__':
         print("Health check: http://localhost:5001/api/health")
         print("Grade endpoint: http://localhost:5001/api/grade")
         print("Transcription endpoint: http://localhost:5001/api/transcription")
+        print("Live stream endpoint: http://localhost:5001/api/stream")
         print("=" * 60)
 
         
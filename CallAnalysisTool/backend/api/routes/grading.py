@@ -9,6 +9,8 @@ import os
 import tempfile
 from api.services.ai_grader import AIGraderService
 from api.services.question_loader import QuestionLoader
+from api.services.grade_cache import grade_cache
+from detect_naturecode import detector_stats
 
 grading_bp = Blueprint('grading', __name__)
 
@@ -44,6 +46,7 @@ def grade_transcript():
     
     Optional query params:
         ?show_evidence=true  - Include evidence in response (not used by AI)
+        ?no_cache=true       - Grade again even if this transcript has cached grades
     
     Returns:
         JSON response with AI grading results
@@ -65,6 +68,7 @@ def grade_transcript():
         
         # Check if evidence should be included (not used by AI, but kept for API compatibility)
         show_evidence = request.args.get('show_evidence', 'false').lower() == 'true'
+        no_cache = request.args.get('no_cache', 'false').lower() == 'true'
         
         # Initialize AI grader (questions now loaded dynamically based on nature codes)
         ai_grader = AIGraderService()
@@ -73,7 +77,8 @@ def grade_transcript():
         # Returns: (grades, primary_nature_code, all_questions)
         grades, primary_nature_code, questions = ai_grader.grade_transcript(
             transcript_data, 
-            show_evidence=show_evidence
+            show_evidence=show_evidence,
+            use_cache=not no_cache
         )
         
         # Calculate percentage score
@@ -108,7 +113,8 @@ def grade_transcript():
                 'grader_version': '2.0.0',
                 'model': 'llama3.1:8b',
                 'questions_source': f'EMSQA.csv (Case Entry + {primary_nature_code})',
-                'nature_code_detection': 'keyword + embedding model'
+                'nature_code_detection': 'keyword + embedding model',
+                'cache_hit': ai_grader.last_cache_hit
             }
         }
         
@@ -166,6 +172,8 @@ def upload_and_grade():
     For Camden's frontend: Upload .json transcript file, get grading results
     
     Request: multipart/form-data with 'file' field
+    Optional query params:
+        ?no_cache=true - Grade again even if this transcript has cached grades
     Response: Same format as /api/grade
     """
     try:
@@ -211,7 +219,8 @@ def upload_and_grade():
             # Grade the transcript using AI with nature code detection
             grades, primary_nature_code, questions = ai_grader.grade_transcript(
                 transcript_data, 
-                show_evidence=False
+                show_evidence=False,
+                use_cache=request.args.get('no_cache', 'false').lower() != 'true'
             )
             
             # Calculate percentage score
@@ -246,7 +255,8 @@ def upload_and_grade():
                     'grader_version': '2.0.0',
                     'model': 'llama3.1:8b',
                     'questions_source': f'EMSQA.csv (Case Entry + {primary_nature_code})',
-                    'nature_code_detection': 'keyword + embedding model'
+                    'nature_code_detection': 'keyword + embedding model',
+                    'cache_hit': ai_grader.last_cache_hit
                 }
             }
             
@@ -317,7 +327,9 @@ def grading_status():
                 'status': 'ready',
                 'model': 'llama3.1:8b',
                 'message': 'AI grading is ready to use',
-                'estimated_grading_time': '2-3 minutes per transcript'
+                'estimated_grading_time': '2-3 minutes per transcript',
+                'nature_code_detection': detector_stats(),
+                'grade_cache': grade_cache.stats()
             }), 200
         else:
             return jsonify({
@@ -0,0 +1,157 @@
+"""
+Streaming transcription endpoints for live calls
+
+Audio is sent as raw 16-bit little-endian mono PCM in the body of chunked POST requests and is
+decoded by the session's worker in the background. Final and partial segments are pushed as
+server-sent events from /events as they are decoded; clients that don't listen there get the
+segments finalized so far with each audio POST instead.
+"""
+
+import json
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+from api.routes.transcription import get_transcriber
+from api.services.transcription_pipeline.transcription.streaming import stream_sessions, StreamBacklogFull, SAMPLE_RATE
+
+streaming_bp = Blueprint('streaming', __name__)
+
+# Bytes read from the request body per feed (0.5 s of 16 kHz PCM16)
+READ_BLOCK_BYTES = 16000
+
+
+def _missing_stream(session_id):
+    """404 for unknown streams, 410 for streams that expired without audio"""
+    if stream_sessions.is_expired(session_id):
+        return jsonify({
+            'error': 'Stream expired',
+            'message': f"No audio for {stream_sessions.idle_timeout:g}s, the stream was closed"
+        }), 410
+    return jsonify({'error': 'Stream not found'}), 404
+
+
+@streaming_bp.route('/stream', methods=['POST'])
+def create_stream():
+    """
+    Open a live transcription stream
+
+    Optional query params:
+        ?sample_rate=8000  - Sample rate of the PCM that will be sent (default: 16000)
+
+    Returns:
+        JSON response with the session ID
+    """
+    try:
+        sample_rate = int(request.args.get('sample_rate', SAMPLE_RATE))
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be positive")
+    except ValueError as e:
+        return jsonify({'error': 'Invalid sample_rate', 'message': str(e)}), 400
+
+    try:
+        session = stream_sessions.create(get_transcriber(), sample_rate=sample_rate)
+    except RuntimeError as e:
+        return jsonify({'error': 'Stream limit reached', 'message': str(e)}), 503
+
+    return jsonify({
+        'session_id': session.session_id,
+        'sample_rate': sample_rate,
+        'format': 'pcm_s16le mono',
+        'audio_url': f"/api/stream/{session.session_id}/audio",
+        'events_url': f"/api/stream/{session.session_id}/events",
+        'end_url': f"/api/stream/{session.session_id}/end"
+    }), 201
+
+
+@streaming_bp.route('/stream/<session_id>/audio', methods=['POST'])
+def stream_audio(session_id):
+    """
+    Send PCM frames to a stream (body: application/octet-stream, may be chunked)
+
+    Returns:
+        JSON response with the segments finalized since the last response or event (not sent on
+        /events as well) and the current partial segments. 410 if the stream expired, 429 (with the
+        bytes accepted before it) if decoding fell too far behind; resend the rest after Retry-After.
+    """
+    session = stream_sessions.get(session_id)
+    if session is None:
+        return _missing_stream(session_id)
+
+    try:
+        received = 0
+        # Feed the body incrementally so a long chunked upload is decoded as it arrives
+        while True:
+            data = request.stream.read(READ_BLOCK_BYTES)
+            if not data:
+                break
+            session.feed(data)
+            received += len(data)
+
+        if not received:
+            return jsonify({'error': 'No audio provided'}), 400
+
+        return jsonify(session.drain())
+
+    except StreamBacklogFull as e:
+        response = jsonify({'error': 'Stream backlog full', 'message': str(e), 'accepted_bytes': received})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    except ValueError as e:
+        return jsonify({'error': 'Stream closed', 'message': str(e)}), 409
+    except Exception as e:
+        print(f"Error transcribing stream {session_id}: {e}")
+        return jsonify({'error': 'Stream transcription failed', 'details': str(e)}), 500
+
+
+@streaming_bp.route('/stream/<session_id>/end', methods=['POST'])
+def end_stream(session_id):
+    """
+    Close a stream, finalizing any remaining audio
+
+    Returns:
+        JSON response with the last finalized segments
+    """
+    session = stream_sessions.close(session_id)
+    if session is None:
+        return _missing_stream(session_id)
+
+    try:
+        return jsonify(session.finish())
+    except Exception as e:
+        print(f"Error finishing stream {session_id}: {e}")
+        return jsonify({'error': 'Stream transcription failed', 'details': str(e)}), 500
+
+
+@streaming_bp.route('/stream/<session_id>', methods=['GET'])
+def stream_status(session_id):
+    """
+    Get the state of an open stream
+
+    Returns:
+        JSON response with stream time, buffered audio and partial segments
+    """
+    session = stream_sessions.get(session_id)
+    if session is None:
+        return _missing_stream(session_id)
+    return jsonify(session.status())
+
+
+@streaming_bp.route('/stream/<session_id>/events', methods=['GET'])
+def stream_events(session_id):
+    """
+    Server-sent events with every update of a stream as it is decoded
+    (event: update, data: the same JSON as the audio response). The last event has "closed": true.
+    """
+    session = stream_sessions.get(session_id)
+    if session is None:
+        return _missing_stream(session_id)
+
+    def generate():
+        for update in session.updates():
+            if update is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: update\ndata: {json.dumps(update)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -7,11 +7,19 @@ from pathlib import Path
 import os
 import sys
 import json
+import uuid
+import threading
 from datetime import datetime
+from werkzeug.utils import secure_filename
 
 from api.services.transcription_pipeline.transcription.whisperx_transcriber import TranscriptionConfig, transcribe_to_json, WhisperXTranscriber
-from api.services.transcription_pipeline.speaker_separate.speaker_separation import speaker_separation
-from api.services.transcription_pipeline.zip_processor import process_zip
+from api.services.transcription_pipeline.transcription.align_model_cache import align_model_cache
+from api.services.transcription_pipeline.transcription.batching import BatchingTranscriber, create_batching_transcriber
+from api.services.transcription_pipeline.transcription.worker_pool import TranscriptionWorkerPool, create_worker_pool
+from api.services.transcription_pipeline.transcript_cache import transcript_cache
+from api.services.transcription_pipeline.speaker_separate.voice_profiles import voice_profiles
+from api.services.transcription_pipeline.pipeline import run_pipeline, PIPELINE_STAGES
+from api.services.job_queue import transcription_queue, QueueFullError
 
 
 transcription_bp = Blueprint('transcription', __name__)
@@ -24,6 +32,11 @@ OUTPUT_DIR.mkdir(exist_ok=True)
 # Global transcriber instance (preloaded at startup)
 _global_transcriber = None
 _transcriber_config = None
+_transcriber_lock = threading.Lock()
+
+# 'batched': one shared model in this process with micro-batching (default)
+# 'process_pool': a pool of worker processes, each with its own model
+TRANSCRIPTION_ENGINE = os.getenv('TRANSCRIPTION_ENGINE', 'batched').lower()
 
 
 def initialize_transcriber():
@@ -33,14 +46,29 @@ def initialize_transcriber():
     """
     global _global_transcriber, _transcriber_config
     
-    if _global_transcriber is None:
+    with _transcriber_lock:
+        if _global_transcriber is not None:
+            return _global_transcriber
+
         print("=" * 60)
         print("Preloading WhisperX model on CPU...")
         print("=" * 60)
         
         _transcriber_config = TranscriptionConfig()
-        _global_transcriber = WhisperXTranscriber(_transcriber_config)
-        _global_transcriber.load_model()
+        if TRANSCRIPTION_ENGINE == 'process_pool':
+            # One model per worker process, each with a fixed share of the cores; one process per
+            # pipeline the job queue runs at a time (TRANSCRIPTION_WORKERS)
+            transcriber = create_worker_pool(_transcriber_config, num_workers=transcription_queue.max_workers)
+            transcriber.warmup()
+        else:
+            transcriber = WhisperXTranscriber(_transcriber_config)
+            transcriber.load_model()
+            transcriber.preload_align_model()
+
+            # Decode VAD chunks of concurrent uploads in shared batches
+            if os.getenv('TRANSCRIPTION_MICRO_BATCHING', 'true').lower() in ('true', '1', 'yes'):
+                transcriber = create_batching_transcriber(transcriber)
+        _global_transcriber = transcriber
         
         print("=" * 60)
         print("WhisperX model preloaded successfully!")
@@ -74,19 +102,38 @@ def return_home():
     })
 
 
+@transcription_bp.route('/transcriber/stats', methods=['GET'])
+def transcriber_stats():
+    """
+    Get cache and model statistics for the transcription service
+    
+    Returns:
+        JSON response with alignment model cache, micro-batching, transcript cache and voice profile counters
+    """
+    batching = _global_transcriber.stats() if isinstance(_global_transcriber, BatchingTranscriber) else None
+    worker_pool = _global_transcriber.stats() if isinstance(_global_transcriber, TranscriptionWorkerPool) else None
+    return jsonify({
+        'success': True,
+        'engine': TRANSCRIPTION_ENGINE,
+        'model_loaded': _global_transcriber is not None,
+        'align_model_cache': align_model_cache.stats(),
+        'micro_batching': batching,
+        'worker_pool': worker_pool,
+        'transcript_cache': transcript_cache.stats(),
+        'voice_profiles': voice_profiles.stats()
+    })
+
+
 @transcription_bp.route('/transcribe', methods=['POST'])
 def transcribe_audio():
     """
-    Transcribes an incoming audio file using WhisperX and speaker separation.
+    Queues an incoming audio file for transcription using WhisperX and speaker separation.
+    The pipeline runs in the background; poll /api/jobs/<job_id> for progress.
     
     Request: multipart/form-data with 'file' field (zip file containing audio)
-    Response: JSON with success message and filename
+    Response: 202 with job ID and status URL
     """
     try:
-        ######################### Transcription Pipeline #########################
-        print("=" * 60)
-        print("Starting transcription pipeline...")
-        print("=" * 60)
         # Check if file exists in request
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -98,53 +145,83 @@ def transcribe_audio():
             return jsonify({'error': 'No file selected'}), 400
         
         print(f"Received file: {file.filename}")
-        file_path = OUTPUT_DIR / file.filename
-        file.save(str(file_path))
-
-        print(f"Extracting file to: {file_path}")
-        folder_name = process_zip(file_path, output_dir=str(OUTPUT_DIR))
-        os.remove(file_path)
-        file_path = OUTPUT_DIR / folder_name
-        audio_file = file_path / f"{folder_name}.wav"
-        print(f"Audio file located at: {audio_file}")
+        # Prefix with a unique ID so concurrent uploads with the same name don't collide
+        upload_path = OUTPUT_DIR / f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
+        file.save(str(upload_path))
+
+        try:
+            job = transcription_queue.submit(
+                _run_transcription_job, upload_path,
+                stages=PIPELINE_STAGES,
+                metadata={'filename': file.filename}
+            )
+        except QueueFullError as e:
+            os.remove(upload_path)
+            return jsonify({
+                'error': 'Transcription queue is full',
+                'message': str(e),
+                'suggestion': 'Retry once some queued transcriptions have finished'
+            }), 503
+
+        print(f"Queued transcription job {job.job_id} for: {file.filename}")
+        return jsonify({
+            'message': f'Queued transcription pipeline for: {file.filename}',
+            'job_id': job.job_id,
+            'status_url': f"/api/jobs/{job.job_id}"
+        }), 202
+        
+    except Exception as e:
+        print(f"Error processing file: {str(e)}")
+        return jsonify({'error': 'Server error processing file', 'details': str(e)}), 500
 
-        # ######################### Transcribe audio to JSON #########################
 
-        # Create config for transcription
-        config = TranscriptionConfig()
-        print('### Transcribing Audio: ((dispatch audio).wav -> (transcription).json ###')
+@transcription_bp.route('/jobs', methods=['GET'])
+def jobs_list():
+    """
+    Get all tracked transcription jobs (newest first)
+    
+    Returns:
+        JSON response with job statuses
+    """
+    jobs = [_job_response(job) for job in transcription_queue.list()]
+    return jsonify({
+        'success': True,
+        'total_count': len(jobs),
+        'pending_count': sum(1 for job in jobs if job['state'] in ('queued', 'running')),
+        'jobs': jobs
+    })
 
-        # Call transcribe_to_json with correct parameters
-        # audio_files: list, output_dir: string, config: TranscriptionConfig
-        transcriber = get_transcriber()
-        result = transcriber.transcribe(str(audio_file))
 
-        # Get output transcription path
-        model_size = config.model_size.replace('-', '')
-        transcription_file = file_path / f"WhisperX_{model_size}_{folder_name}.json"
+@transcription_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the status of a transcription job
+    
+    Args:
+        job_id: ID returned by /api/transcribe
+    
+    Returns:
+        JSON response with state (queued, running, completed, failed), per-stage progress
+        and, once completed, the foldername of the transcription
+    """
+    job = transcription_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_response(job))
 
-        with open(transcription_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
 
-        print(f"Saved transcription to: {transcription_file}")
+def _run_transcription_job(upload_path, progress=None):
+    """Worker-side entry point; the model is fetched here so a cold start never blocks the request"""
+    return run_pipeline(upload_path, OUTPUT_DIR, get_transcriber(), progress=progress)
 
-        # ######################### Speaker Separation #########################
-        
-        print('### Separating Speaker: ((transcription).json -> (transcription w/ separated speakers).json ###')
-        speaker_separation(str(audio_file), transcription_file, file_path)
-        os.remove(transcription_file)  # Removes old transcription file since new separated speakers transcription file is created
-        print('### Finished Transcription Pipeline(Single): (transcription w/ separated speakers).json ###')
 
-        #### Return ####
-        return jsonify({
-            'message': f'Finished transcription pipeline for: {file.filename}',
-            'foldername': folder_name,
-            'file_path': f"output/{folder_name}/{folder_name}.json"
-        })
-        
-    except Exception as e:
-        print(f"Error processing file: {str(e)}")
-        return jsonify({'error': 'Server error processing file', 'details': str(e)}), 500
+def _job_response(job):
+    """Job status with the pipeline result flattened into foldername/file_path"""
+    data = job.to_dict()
+    folder_name = data.pop('result')
+    data['foldername'] = folder_name
+    data['file_path'] = f"output/{folder_name}/{folder_name}.json" if folder_name else None
+    return data
 
 
 @transcription_bp.route('/transcriptions', methods=['GET'])
@@ -3,19 +3,16 @@ AI-based grading service with nature code detection
 Wraps AIGrader.py and detect_naturecode.py to work with the Flask API
 """
 
-import json
-import tempfile
 from typing import Dict, Any, Tuple
 from pathlib import Path
 import sys
-import os
 
 # Add parent backend directory to path for module imports
 backend_path = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(backend_path))
 
 # Import core grading and nature code detection modules
-from JSONTranscriptionParser import json_to_text
+from JSONTranscriptionParser import dict_to_text
 from AIGrader import (
     detect_nature_codes_in_memory,
     extract_all_nature_codes,
@@ -23,6 +20,7 @@ from AIGrader import (
     ai_grade_transcript,
     calculate_final_grade
 )
+from api.services.grade_cache import GradeCache, grade_cache
 
 class AIGraderService:
     """
@@ -46,15 +44,19 @@ class AIGraderService:
         Initialize AI grader
         Questions are now loaded dynamically based on detected nature codes
         """
-        pass
+        # Whether the last grade_transcript() call was served from the grade cache
+        self.last_cache_hit = False
     
-    def grade_transcript(self, transcript_data: Dict[str, Any], show_evidence: bool = False) -> Tuple[Dict[str, Any], str, Dict[str, str]]:
+    def grade_transcript(self, transcript_data: Dict[str, Any], show_evidence: bool = False,
+                         use_cache: bool = True) -> Tuple[Dict[str, Any], str, Dict[str, str]]:
         """
         Grade a transcript using AI with nature code detection
         
         Args:
             transcript_data: Group B's JSON format with 'segments' array
             show_evidence: Whether to include evidence (not used currently)
+            use_cache: Reuse cached grades for the same transcript, questions, model and prompt
+                       (the result is always stored)
         
         Returns:
             Tuple of (formatted_grades, primary_nature_code, all_questions)
@@ -65,62 +67,53 @@ class AIGraderService:
                 ...
             }
         """
-        # JSONTranscriptionParser expects a file path, so create a temp file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as tmp:
-            json.dump(transcript_data, tmp)
-            tmp_path = tmp.name
+        # Step 1: Convert JSON to text format
+        transcript_text = dict_to_text(transcript_data)
+        if not transcript_text:
+            raise ValueError("Failed to parse transcript data")
+
+        # Step 2: Detect nature codes
+        detection = detect_nature_codes_in_memory(transcript_text)
+        
+        # Step 3: Extract and sort nature codes by confidence
+        nature_codes = extract_all_nature_codes(detection)
+        if not nature_codes:
+            raise RuntimeError("No nature codes detected in transcript")
+        
+        # Step 4: Get primary nature code (highest confidence)
+        primary_nature_code = nature_codes[0][0]
+        
+        # Step 5: Load questions for Case Entry AND primary nature code
+        case_entry_questions = load_nature_code_questions("Case Entry")
+        nature_code_questions = load_nature_code_questions(primary_nature_code)
         
-        try:
-            # Step 1: Convert JSON to text format
-            transcript_text = json_to_text(tmp_path)
-            if not transcript_text:
-                raise ValueError("Failed to parse transcript data")
-            
-            # Step 2: Detect nature codes
-            nature_codes_text = detect_nature_codes_in_memory(tmp_path, transcript_text)
-            if not nature_codes_text:
-                raise RuntimeError("Failed to detect nature codes")
-            
-            # Step 3: Extract and sort nature codes by confidence
-            nature_codes = extract_all_nature_codes(nature_codes_text)
-            if not nature_codes:
-                raise RuntimeError("No nature codes detected in transcript")
-            
-            # Step 4: Get primary nature code (highest confidence)
-            primary_nature_code = nature_codes[0][0]
-            
-            # Step 5: Load questions for Case Entry AND primary nature code
-            case_entry_questions = load_nature_code_questions("Case Entry")
-            nature_code_questions = load_nature_code_questions(primary_nature_code)
-            
-            # Combine into one dict
-            all_questions = {**case_entry_questions, **nature_code_questions}
-            
-            if not all_questions:
-                raise RuntimeError("Failed to load questions from EMSQA.csv")
-            
-            # Step 6: Get AI grades
+        # Combine into one dict
+        all_questions = {**case_entry_questions, **nature_code_questions}
+        
+        if not all_questions:
+            raise RuntimeError("Failed to load questions from EMSQA.csv")
+        
+        # Step 6: Get AI grades (from the grade cache if this transcript was graded before)
+        cache_key = GradeCache.make_key(transcript_text, all_questions, primary_nature_code)
+        ai_grades = grade_cache.get(cache_key) if use_cache else None
+        self.last_cache_hit = ai_grades is not None
+        if ai_grades is None:
             ai_grades = ai_grade_transcript(transcript_text, all_questions, primary_nature_code)
-            
             if not ai_grades:
                 raise RuntimeError("AI grading failed - empty response from Ollama")
-            
-            # Step 7: Format grades to match API response structure
-            formatted_grades = {}
-            for q_id, question_text in all_questions.items():
-                code = ai_grades.get(q_id, "2")  # Default to "Not Asked" if missing
-                formatted_grades[q_id] = {
-                    "code": code,
-                    "label": question_text,
-                    "status": self.KEY.get(code, "Unknown")
-                }
-            
-            return formatted_grades, primary_nature_code, all_questions
+            grade_cache.put(cache_key, ai_grades)
+        
+        # Step 7: Format grades to match API response structure
+        formatted_grades = {}
+        for q_id, question_text in all_questions.items():
+            code = ai_grades.get(q_id, "2")  # Default to "Not Asked" if missing
+            formatted_grades[q_id] = {
+                "code": code,
+                "label": question_text,
+                "status": self.KEY.get(code, "Unknown")
+            }
         
-        finally:
-            # Clean up temp file
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
+        return formatted_grades, primary_nature_code, all_questions
     
     def calculate_percentage(self, grades: Dict[str, Any], questions: Dict[str, str]) -> float:
         """
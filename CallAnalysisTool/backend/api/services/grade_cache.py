@@ -0,0 +1,73 @@
+"""
+Grading result cache
+
+Stores AI grades on disk keyed by a hash of the normalized transcript text, the graded question IDs,
+the nature code, the Ollama model and options and the prompt version, so regrading a transcript
+skips the llama3.1:8b generation.
+
+Usage:
+    key = GradeCache.make_key(transcript_text, questions, nature_code)
+    grades = grade_cache.get(key)
+    if grades is None:
+        grades = ai_grade_transcript(transcript_text, questions, nature_code)
+        grade_cache.put(key, grades)
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Dict
+
+from AIGrader import GRADING_MODEL, GRADING_OPTIONS, PROMPT_VERSION
+from api.services.transcription_pipeline.transcript_cache import TranscriptCache
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "cache" / "grades"
+
+
+class GradeCache(TranscriptCache):
+    """
+    Size-bounded on-disk cache of AI grades
+
+    Storage and least-recently-used eviction are the same as TranscriptCache; only the key differs.
+    """
+
+    @staticmethod
+    def normalize_transcript(transcript_text: str) -> str:
+        """Collapse whitespace and drop empty lines, so formatting differences still hit the cache."""
+        lines = (" ".join(line.split()) for line in transcript_text.splitlines())
+        return "\n".join(line for line in lines if line)
+
+    @staticmethod
+    def make_key(transcript_text: str, questions: Dict[str, str], nature_code: str) -> str:
+        """
+        Build a cache key
+
+        Args:
+            transcript_text: Plain transcript text sent to the model
+            questions:       Graded questions (only the sorted IDs are part of the key)
+            nature_code:     Nature code named in the prompt
+        """
+        payload = json.dumps({
+            'transcript': GradeCache.normalize_transcript(transcript_text),
+            'questions': sorted(questions),
+            'nature_code': nature_code,
+            'model': GRADING_MODEL,
+            'options': GRADING_OPTIONS,
+            'prompt_version': PROMPT_VERSION,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.pop('pipeline_version', None)
+        stats['prompt_version'] = PROMPT_VERSION
+        return stats
+
+
+# Shared cache for the API
+# GRADE_CACHE_DIR: where entries are stored, GRADE_CACHE_MB: size budget (0 disables the cache)
+grade_cache = GradeCache(
+    cache_dir=os.getenv('GRADE_CACHE_DIR', str(DEFAULT_CACHE_DIR)),
+    max_bytes=int(os.getenv('GRADE_CACHE_MB', '64')) * 1024 * 1024
+)
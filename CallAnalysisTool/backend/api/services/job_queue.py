@@ -0,0 +1,164 @@
+"""
+Background job queue for long-running transcription work
+Runs jobs on a bounded thread pool so HTTP requests can return immediately
+"""
+
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the queue already holds the maximum number of unfinished jobs"""
+
+
+class Job:
+    """
+    A single queued unit of work with per-stage progress
+
+    States: queued -> running -> completed | failed
+    Stage states: pending -> running -> completed | failed
+    """
+
+    def __init__(self, stages: Iterable[str], metadata: Optional[Dict[str, Any]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.state = 'queued'
+        self.stages = OrderedDict((name, {'status': 'pending', 'started_at': None, 'finished_at': None})
+                                  for name in stages)
+        self.metadata = dict(metadata or {})
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow().isoformat() + 'Z'
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update_stage(self, stage: str, status: str):
+        """Progress callback passed to the job function: update_stage('transcribe', 'running')"""
+        now = datetime.utcnow().isoformat() + 'Z'
+        with self._lock:
+            info = self.stages.setdefault(stage, {'status': 'pending', 'started_at': None, 'finished_at': None})
+            info['status'] = status
+            if status == 'running':
+                info['started_at'] = now
+            elif status in ('completed', 'failed'):
+                info['finished_at'] = now
+
+    @property
+    def done(self) -> bool:
+        return self.state in ('completed', 'failed')
+
+    def progress(self) -> float:
+        """Percentage of stages completed (0.0 - 100.0)"""
+        if not self.stages:
+            return 100.0 if self.done else 0.0
+        completed = sum(1 for s in self.stages.values() if s['status'] == 'completed')
+        return round(completed / len(self.stages) * 100, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable job status"""
+        with self._lock:
+            return {
+                'job_id': self.job_id,
+                'state': self.state,
+                'progress': self.progress(),
+                'stages': {name: dict(info) for name, info in self.stages.items()},
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'metadata': dict(self.metadata),
+            }
+
+
+class JobQueue:
+    """
+    Bounded worker pool with job tracking
+
+    Args:
+        max_workers: Number of jobs that run at the same time
+        max_pending: Maximum number of unfinished (queued + running) jobs accepted
+        max_history: Number of finished jobs kept for status polling
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 20, max_history: int = 200):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job-worker')
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[..., Any], *args, stages: Iterable[str] = (),
+               metadata: Optional[Dict[str, Any]] = None, **kwargs) -> Job:
+        """
+        Queue func(*args, progress=job.update_stage, **kwargs)
+
+        Returns:
+            The queued Job (poll with get())
+        Raises:
+            QueueFullError: if max_pending unfinished jobs are already queued
+        """
+        job = Job(stages, metadata)
+        with self._lock:
+            if self.pending_count() >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} jobs pending)")
+            self._jobs[job.job_id] = job
+            self._prune_history()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """All tracked jobs, newest first"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def _prune_history(self):
+        """Drop the oldest finished jobs once more than max_history are tracked"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job, func, args, kwargs):
+        with job._lock:
+            job.state = 'running'
+            job.started_at = datetime.utcnow().isoformat() + 'Z'
+        try:
+            result = func(*args, progress=job.update_stage, **kwargs)
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {e}")
+            for name, info in job.to_dict()['stages'].items():
+                if info['status'] == 'running':
+                    job.update_stage(name, 'failed')
+            self._finish(job, 'failed', error=str(e))
+        else:
+            self._finish(job, 'completed', result=result)
+
+    @staticmethod
+    def _finish(job: Job, state: str, result=None, error=None):
+        """Set all terminal fields together, so a poller never sees a finished job without its result"""
+        with job._lock:
+            job.result = result
+            job.error = error
+            job.finished_at = datetime.utcnow().isoformat() + 'Z'
+            job.state = state
+
+
+# Shared queue for transcription uploads
+# TRANSCRIPTION_WORKERS: concurrent pipelines, TRANSCRIPTION_MAX_PENDING: queue bound
+transcription_queue = JobQueue(
+    max_workers=int(os.getenv('TRANSCRIPTION_WORKERS', '2')),
+    max_pending=int(os.getenv('TRANSCRIPTION_MAX_PENDING', '20'))
+)
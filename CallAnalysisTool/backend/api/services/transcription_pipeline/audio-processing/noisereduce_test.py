@@ -3,14 +3,19 @@ import soundfile as sf
 import numpy as np
 import os
 
-def run_noisereduce(input_path, output_path):
-    """Simple test for noisereduce spectral gating."""
-    if not os.path.exists(input_path):
+def run_noisereduce(input_path, output_path, audio=None):
+    """Simple test for noisereduce spectral gating.
+
+    audio: optional PipelineAudio already decoded by the pipeline (skips reading input_path)
+    """
+    if audio is not None:
+        data, rate = audio.samples, audio.sample_rate
+    elif not os.path.exists(input_path):
         print(f"Input file not found: {input_path}")
         return
-
-    # Load audio
-    data, rate = sf.read(input_path)
+    else:
+        # Load audio
+        data, rate = sf.read(input_path)
 
     # Convert to mono if stereo
     if len(data.shape) > 1:
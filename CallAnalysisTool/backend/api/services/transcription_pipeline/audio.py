@@ -0,0 +1,143 @@
+"""
+Decoded call audio shared by every pipeline stage
+
+The audio is decoded once (16 kHz mono float32, exactly what whisperx.load_audio returns) and can be
+cached as a .npy file next to the .wav. Later stages and worker processes memory-map that file
+instead of decoding again, and all stages read the same buffer without copying it. The cached
+decode is streamed from ffmpeg straight to disk, so it never holds the whole call in memory.
+The .npy is scratch space for one pipeline run: release() deletes it once the run is finished.
+
+Usage:
+    audio = PipelineAudio.from_file("output/20251017_123101_bjones/20251017_123101_bjones.wav", cache=True)
+    try:
+        transcriber.transcribe(audio_file, audio=audio)
+        extract_mfcc_features(audio_file, audio=audio)
+    finally:
+        audio.release()
+"""
+
+import os
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+# int16 samples converted per block when streaming a decode to disk (~2 MB of float32)
+DECODE_BLOCK_SAMPLES = 1 << 19
+
+
+def _ffmpeg_command(audio_file, sample_rate: int):
+    # Same command as whisperx.load_audio
+    return [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", str(audio_file),
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "-"
+    ]
+
+
+def decode_audio(audio_file, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any ffmpeg-readable file to mono float32 (same command as whisperx.load_audio)."""
+    try:
+        out = subprocess.run(_ffmpeg_command(audio_file, sample_rate), capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def decode_audio_to_npy(audio_file, npy_path, sample_rate: int = SAMPLE_RATE):
+    """
+    Decode to a float32 .npy file in fixed-size blocks (memory use does not grow with the call length).
+    ffmpeg's PCM is spooled to a temporary file first, since the .npy header needs the sample count.
+    """
+    npy_path = Path(npy_path)
+    pcm_path = npy_path.with_suffix('.pcm.tmp')
+    tmp_path = npy_path.with_suffix('.npy.tmp')
+    try:
+        with open(pcm_path, 'wb') as pcm, tempfile.TemporaryFile() as stderr:
+            result = subprocess.run(_ffmpeg_command(audio_file, sample_rate), stdout=pcm, stderr=stderr)
+            if result.returncode != 0:
+                stderr.seek(0)
+                raise RuntimeError(f"Failed to load audio: {stderr.read().decode(errors='ignore')}")
+
+        n_samples = os.path.getsize(pcm_path) // 2
+        samples = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(n_samples,))
+        with open(pcm_path, 'rb') as pcm:
+            for start in range(0, n_samples, DECODE_BLOCK_SAMPLES):
+                block = np.fromfile(pcm, dtype=np.int16, count=min(DECODE_BLOCK_SAMPLES, n_samples - start))
+                samples[start:start + len(block)] = block / np.float32(32768.0)
+        samples.flush()
+        del samples
+        os.replace(tmp_path, npy_path)
+    finally:
+        for path in (pcm_path, tmp_path):
+            if path.exists():
+                path.unlink()
+
+
+class PipelineAudio:
+    """
+    Decoded audio for one call
+
+    Attributes:
+        samples:     float32 mono samples (read-only memmap when loaded from the .npy cache)
+        sample_rate: Always 16000
+        source:      Path of the original audio file
+        cache_file:  The .npy the samples are mapped from (None for in-memory decodes)
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = SAMPLE_RATE, source=None, cache_file=None):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.source = source
+        self.cache_file = cache_file
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def release(self):
+        """
+        Delete the cached .npy. The samples already mapped stay readable until they are dropped
+        (on Windows a mapped file can't be deleted and is left for the next run to reuse).
+        """
+        if self.cache_file is None:
+            return
+        try:
+            Path(self.cache_file).unlink(missing_ok=True)
+        except OSError:
+            pass
+        self.cache_file = None
+
+    @staticmethod
+    def cache_path(audio_file) -> Path:
+        return Path(audio_file).with_suffix('.npy')
+
+    @classmethod
+    def from_file(cls, audio_file, cache: bool = False) -> 'PipelineAudio':
+        """
+        Load decoded audio for a file
+
+        Args:
+            audio_file: Path to the original audio file
+            cache:      Write <audio>.npy after decoding so later loads (and worker processes) can
+                        memory-map it. An existing, up-to-date .npy is always used.
+                        Call release() when done so the .npy is not left next to the audio.
+        """
+        audio_file = Path(audio_file)
+        npy_path = cls.cache_path(audio_file)
+
+        if npy_path.exists() and npy_path.stat().st_mtime >= audio_file.stat().st_mtime:
+            try:
+                return cls(np.load(npy_path, mmap_mode='r'), source=audio_file, cache_file=npy_path)
+            except (ValueError, OSError):
+                pass  # Corrupt/partial cache file, decode again
+
+        if cache:
+            decode_audio_to_npy(audio_file, npy_path)
+            return cls(np.load(npy_path, mmap_mode='r'), source=audio_file, cache_file=npy_path)
+        return cls(decode_audio(audio_file), source=audio_file)
@@ -0,0 +1,142 @@
+"""
+Transcription pipeline for uploaded call zips.
+
+Runs the same steps the /api/transcribe endpoint used to run inline:
+    (call).zip -> (dispatch audio).wav -> (transcription) -> (transcription w/ separated speakers).json
+
+The transcription is passed between stages as a Transcript; only the final JSON is written.
+
+Usage:
+    folder_name = run_pipeline("output/upload.zip", "output", transcriber)
+"""
+
+import os
+import json
+import zlib
+import threading
+from pathlib import Path
+
+from api.services.transcription_pipeline.speaker_separate.speaker_separation import (
+    speaker_separation, check_separation_config, extract_dispatcher_name
+)
+from api.services.transcription_pipeline.speaker_separate.voice_profiles import voice_profiles
+from api.services.transcription_pipeline.zip_processor import process_zip, read_call_name
+from api.services.transcription_pipeline.transcript_cache import TranscriptCache, transcript_cache
+from api.services.transcription_pipeline.audio import PipelineAudio
+from api.services.transcription_pipeline.transcript import Transcript
+
+# Stages reported to progress callbacks, in the order they run
+PIPELINE_STAGES = ('extract', 'transcribe', 'separate')
+
+# Split segments where the speaker changes mid-segment (uses WhisperX word timestamps)
+WORD_LEVEL_SEPARATION = os.getenv('SPEAKER_WORD_SPLITTING', 'false').lower() == 'true'
+# Acoustic clustering backend ('vote' or 'kmeans') and speakers per call (more than 2 needs 'kmeans')
+SPEAKER_CLUSTERING = os.getenv('SPEAKER_CLUSTERING', 'vote')
+SPEAKER_COUNT = int(os.getenv('SPEAKER_COUNT', '2'))
+# Fail at startup on an impossible combination (e.g. SPEAKER_COUNT=3 with the vote backend) instead
+# of in the separate stage of every job, after its transcription
+try:
+    check_separation_config(SPEAKER_CLUSTERING, SPEAKER_COUNT)
+except ValueError as e:
+    raise ValueError(f"Invalid SPEAKER_CLUSTERING/SPEAKER_COUNT: {e}") from e
+
+# Two uploads of the same call share one output folder (process_zip replaces it), so they run one
+# after the other. Folders are hashed onto a fixed set of locks instead of keeping one per call.
+_FOLDER_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _folder_lock(folder_name):
+    return _FOLDER_LOCKS[zlib.crc32(folder_name.encode('utf-8')) % len(_FOLDER_LOCKS)]
+
+
+def run_pipeline(upload_path, output_dir, transcriber, progress=None, cache=transcript_cache):
+    """
+    Runs the full transcription pipeline for one uploaded zip file.
+
+    Args:
+        upload_path (str or Path): Path to the uploaded zip file (removed once extracted)
+        output_dir (str or Path):  Directory where the call folder is created
+        transcriber:               Preloaded WhisperXTranscriber (or compatible) instance
+        progress (callable):       Optional callback progress(stage, status) where status
+                                   is 'running' or 'completed'
+        cache (TranscriptCache):   Cache of finished transcripts (None disables caching)
+    Returns:
+        str: The call folder name (YYYYMMDD_HHMMSS_dispatchername)
+    """
+    # Unreadable zips fail in process_zip below, they have no folder to protect
+    folder_name = read_call_name(upload_path)
+    if folder_name is None:
+        return _run_pipeline(upload_path, output_dir, transcriber, progress, cache)
+    with _folder_lock(folder_name):
+        return _run_pipeline(upload_path, output_dir, transcriber, progress, cache)
+
+
+def _run_pipeline(upload_path, output_dir, transcriber, progress, cache):
+    report = progress or (lambda stage, status: None)
+    output_dir = Path(output_dir)
+
+    ######################### Extract zip #########################
+    report('extract', 'running')
+    print(f"Extracting file: {upload_path}")
+    folder_name = process_zip(upload_path, output_dir=str(output_dir))
+    if os.path.exists(upload_path):
+        os.remove(upload_path)
+    if not folder_name:
+        raise ValueError("Could not process zip file (missing CDR or audio)")
+
+    file_path = output_dir / folder_name
+    audio_file = file_path / f"{folder_name}.wav"
+    print(f"Audio file located at: {audio_file}")
+    report('extract', 'completed')
+
+    ######################### Transcript cache lookup #########################
+    # Re-uploads of the same call decode to the same audio, so the finished transcript can be reused
+    output_file = file_path / f"{folder_name}.json"
+    # Decoded once to a .npy next to the .wav that every stage below (and worker processes) maps;
+    # the .npy is deleted when the run ends so nothing but the transcript is left in the call folder
+    audio = PipelineAudio.from_file(audio_file, cache=True)
+    try:
+        cache_key = None
+        # With voice profiles on, the labels depend on the dispatcher's profile as it is now, and a
+        # call clustered without a ready profile has to update it, so such calls skip the cache
+        profile_state = None
+        use_cache = cache is not None and cache.enabled
+        if use_cache and voice_profiles.enabled and SPEAKER_COUNT == 2:
+            profile_state = voice_profiles.cache_state(extract_dispatcher_name(str(audio_file))[2])
+            use_cache = profile_state is not None
+        if use_cache:
+            cache_key = cache.make_key(TranscriptCache.audio_hash(audio.samples), transcriber.config, 'diarized',
+                                       name=folder_name, word_level=WORD_LEVEL_SEPARATION,
+                                       clustering=SPEAKER_CLUSTERING, speakers=SPEAKER_COUNT,
+                                       **({'profiles': profile_state} if profile_state else {}))
+            cached = cache.get(cache_key)
+            if cached is not None:
+                print(f"Transcript cache hit for {folder_name}, skipping transcription")
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    json.dump(cached, f, indent=2, ensure_ascii=False)
+                for stage in ('transcribe', 'separate'):
+                    report(stage, 'completed')
+                return folder_name
+
+        ######################### Transcribe audio #########################
+        report('transcribe', 'running')
+        print('### Transcribing Audio: ((dispatch audio).wav -> (transcription) ###')
+        transcript = Transcript.from_whisperx(transcriber.transcribe(str(audio_file), audio=audio))
+        report('transcribe', 'completed')
+
+        ######################### Speaker Separation #########################
+        report('separate', 'running')
+        print('### Separating Speaker: ((transcription) -> (transcription w/ separated speakers).json ###')
+        # Only the final transcript is written; the WhisperX result is passed in memory
+        separated = speaker_separation(str(audio_file), transcript, file_path, audio=audio,
+                                       word_level=WORD_LEVEL_SEPARATION, clustering=SPEAKER_CLUSTERING,
+                                       num_speakers=SPEAKER_COUNT, profiles=voice_profiles)
+        print('### Finished Transcription Pipeline(Single): (transcription w/ separated speakers).json ###')
+        report('separate', 'completed')
+
+        if cache_key:
+            cache.put(cache_key, separated)
+
+        return folder_name
+    finally:
+        audio.release()
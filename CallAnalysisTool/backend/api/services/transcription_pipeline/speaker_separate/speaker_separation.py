@@ -1,189 +1,578 @@
 """
 USAGE:
-    python3 speaker_separation.py <audio_file.wav> <transcription.json>
+    python3 speaker_separation.py <audio_file.wav> <transcription.json> [--words] [--clustering kmeans --speakers 3]
 
     (python3 might not be necessary if running in a virtual environment)
 
     Arguments:
         audio_file.wav     - WAV audio file of emergency call
         transcription.json - WhisperX transcription JSON output with naming convention: YYYYMMDD_HHMMSS_dispatchername.json
+        --words            - Split segments where the speaker changes mid-segment (needs word timestamps)
+        --clustering       - Acoustic clustering backend: vote (default) or kmeans
+        --speakers         - Number of speakers (default: 2; 3+ needs kmeans, extra speakers are caller_2, caller_3, ...)
+        --profiles         - Label by, and update, the dispatcher's stored voice profile (needs VOICE_PROFILE_MIN_CALLS > 0)
 
     Output:
         Creates <audio_basename>.json in the same directory as the input JSON file
         Output format includes date, time, dispatcher name extracted from input filename
 
+    Two-channel recordings (dispatcher and caller on separate channels) are separated by channel
+    energy instead of MFCC clustering.
+
 REQUIREMENTS:
     - Python 3.7+
     - numpy
     - librosa
+    - soundfile
 """
 import numpy as np
 import json
 import os
 import sys
+import argparse
 import librosa
+import soundfile as sf
+from pathlib import Path
+
+try:
+    from ..audio import PipelineAudio
+    from ..transcript import Transcript
+    from .voice_profiles import voice_profiles
+except ImportError:  # Run directly as a script
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from audio import PipelineAudio
+    from transcript import Transcript
+    from voice_profiles import voice_profiles
+
+def transcript_segments(transcript, include_words=False):
+    """
+    Gets the speech segments with timestamps and text from an in-memory transcript.
 
-def load_whisperx_transcription(json_path):
+    Args:
+        transcript(Transcript): The WhisperX transcript.
+        include_words(bool):    Also keep each segment's aligned words (for word-level splitting).
+    Returns:
+        A list of dictionaries, each containing the start time, end time, text, and duration of a speech segment.
+    """
+    segments = []
+    for s in transcript.segments:
+        segment = {'start': s.start, 'end': s.end, 'text': s.text, 'duration': s.duration}
+        if include_words:
+            segment['words'] = [w.to_dict() for w in s.words]
+        segments.append(segment)
+    return segments
+
+def load_whisperx_transcription(json_path, include_words=False):
     """
     Loads the WhisperX transcription data to get speech segments with timestamps and text.
 
     Args:
-        json_path(str): The path to the WhisperX transcription JSON file.
+        json_path(str):      The path to the WhisperX transcription JSON file.
+        include_words(bool): Also keep each segment's aligned words (for word-level splitting).
     Returns:
         A list of dictionaries, each containing the start time, end time, text, and duration of a speech segment.
     """
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return [{'start': s['start'], 'end': s['end'], 'text': s['text'].strip(),
-             'duration': s['end'] - s['start']} for s in data['segments']]
+    return transcript_segments(Transcript.from_file(json_path), include_words)
+
+class StreamingMfcc:
+    """
+    MFCC statistics of a recording, computed block by block.
+
+    Frames are laid out exactly like librosa.feature.mfcc with center=True (frame t is centred on
+    sample t * hop_length), but only block_frames frames are held in memory at a time, so memory
+    stays constant however long the call is. Blocks no requested range touches are skipped.
+
+    Args:
+        samples(numpy.ndarray): Mono audio at a fixed analysis rate (usually a memmap of the decoded call).
+        sr(int):                The sample rate of samples.
+        n_mfcc(int):            The number of MFCC coefficients to extract.
+        hop_length(int):        The hop length for the MFCC calculation.
+        n_fft(int):             The FFT window length.
+        block_frames(int):      Frames computed per block.
+    """
+
+    def __init__(self, samples, sr, n_mfcc=13, hop_length=512, n_fft=2048, block_frames=1024):
+        self.samples = samples
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.hop_length = hop_length
+        self.n_fft = n_fft
+        self.block_frames = block_frames
+        self.n_frames = 1 + len(samples) // hop_length
+
+    def _block(self, first_frame, last_frame):
+        """MFCCs of frames [first_frame, last_frame), zero-padded past the ends of the recording."""
+        start = first_frame * self.hop_length - self.n_fft // 2
+        length = (last_frame - first_frame - 1) * self.hop_length + self.n_fft
+        y = np.zeros(length, dtype=np.float32)
+        lo, hi = max(start, 0), min(start + length, len(self.samples))
+        if hi > lo:
+            y[lo - start:hi - start] = self.samples[lo:hi]
+        mel = librosa.feature.melspectrogram(y=y, sr=self.sr, n_fft=self.n_fft,
+                                             hop_length=self.hop_length, center=False)
+        # Fixed dB floor instead of top_db, which would depend on the loudest frame of each block
+        return librosa.feature.mfcc(S=librosa.power_to_db(mel, top_db=None), n_mfcc=self.n_mfcc)
+
+    def range_means(self, start_frames, end_frames):
+        """
+        Calculates the mean of every MFCC coefficient over many frame ranges in one pass.
+        Each block adds its share of every overlapping range from a cumulative sum over its frames.
+
+        Args:
+            start_frames(numpy.ndarray): Start frame of each range.
+            end_frames(numpy.ndarray):   End frame (exclusive) of each range.
+        Returns:
+            A (ranges x n_mfcc) array of means. Empty ranges are all zeros.
+        """
+        starts = np.clip(start_frames, 0, self.n_frames)
+        ends = np.clip(end_frames, 0, self.n_frames)
+        counts = ends - starts
+        sums = np.zeros((len(starts), self.n_mfcc), dtype=np.float64)
+
+        for first in range(0, self.n_frames, self.block_frames):
+            last = min(first + self.block_frames, self.n_frames)
+            active = np.flatnonzero((starts < last) & (ends > first) & (counts > 0))
+            if len(active) == 0:
+                continue
+            block = self._block(first, last)
+            prefix = np.zeros((self.n_mfcc, last - first + 1), dtype=np.float64)
+            prefix[:, 1:] = np.cumsum(block, axis=1, dtype=np.float64)
+            lo = np.clip(starts[active] - first, 0, last - first)
+            hi = np.clip(ends[active] - first, 0, last - first)
+            sums[active] += (prefix[:, hi] - prefix[:, lo]).T
+
+        valid = counts > 0
+        means = np.zeros_like(sums)
+        means[valid] = sums[valid] / counts[valid, None]
+        return means
+
+    def time_range_means(self, start_times, end_times):
+        """range_means for time spans in seconds (frame bounds truncated like segment_frame_bounds)."""
+        start_frames = np.maximum(0, (np.asarray(start_times) * self.sr / self.hop_length).astype(np.int64))
+        end_frames = np.minimum(self.n_frames, (np.asarray(end_times) * self.sr / self.hop_length).astype(np.int64))
+        return self.range_means(start_frames, end_frames)
+
+# Median per-segment level difference below which two channels are treated as the same audio
+STEREO_MIN_SEPARATION_DB = 3.0
+
+def is_two_channel(audio_path):
+    """Whether the audio file has exactly two channels (False if soundfile cannot read it)."""
+    try:
+        return sf.info(str(audio_path)).channels == 2
+    except RuntimeError:
+        return False
+
+class ChannelEnergy:
+    """
+    Per-channel frame energy of a two-channel recording.
 
-def extract_mfcc_features(audio_path, n_mfcc=13, hop_length=512):
+    The file is read block by block at its native rate, keeping only a cumulative sum of the
+    energy of each 10 ms frame per channel, so the level of any time span is O(1).
+
+    Args:
+        audio_path(str):  The path to the audio file.
+        frame_s(float):   Frame length in seconds.
+        block_frames(int): Frames read per block.
+    """
+
+    def __init__(self, audio_path, frame_s=0.01, block_frames=4096):
+        info = sf.info(str(audio_path))
+        self.sr = info.samplerate
+        self.hop = max(1, int(round(self.sr * frame_s)))
+
+        energies = [np.zeros((1, info.channels))]
+        for block in sf.blocks(str(audio_path), blocksize=self.hop * block_frames, dtype='float32', always_2d=True):
+            n_frames = -(-len(block) // self.hop)
+            padded = np.zeros((n_frames * self.hop, block.shape[1]), dtype=np.float32)
+            padded[:len(block)] = block
+            energies.append((padded.reshape(n_frames, self.hop, -1) ** 2).sum(axis=1, dtype=np.float64))
+        self.prefix = np.cumsum(np.concatenate(energies), axis=0)
+        self.n_frames = len(self.prefix) - 1
+
+    def range_db(self, start_times, end_times):
+        """
+        Mean power of each channel over many time spans at once, in dB.
+
+        Args:
+            start_times(numpy.ndarray): Span start times in seconds.
+            end_times(numpy.ndarray):   Span end times in seconds.
+        Returns:
+            A (spans x channels) array of levels in dB.
+        """
+        starts = np.clip((np.asarray(start_times) * self.sr / self.hop).astype(np.int64), 0, self.n_frames)
+        ends = np.clip((np.asarray(end_times) * self.sr / self.hop).astype(np.int64), 0, self.n_frames)
+        # Spans shorter than a frame still cover one frame
+        ends = np.maximum(ends, np.minimum(starts + 1, self.n_frames))
+        starts = np.minimum(starts, ends - 1).clip(0)
+        counts = np.maximum(ends - starts, 1)[:, None] * self.hop
+        power = (self.prefix[ends] - self.prefix[starts]) / counts
+        return 10 * np.log10(power + 1e-10)
+
+def extract_mfcc_features(audio_path, n_mfcc=13, hop_length=512, audio=None):
     """
-    Extracts acoustic features (MFCCs) from the audio file.
+    Prepares block-streaming acoustic features (MFCCs) for the audio file.
+    Audio is analysed at 16 kHz from a memory-mapped decode, so the whole call is never held in memory.
 
     Args:
         audio_path(str): The path to the audio file.
         n_mfcc(int):     The number of MFCC coefficients to extract.
         hop_length(int): The hop length for the MFCC calculation.
+        audio(PipelineAudio): Optional audio already decoded by the pipeline (used instead of decoding audio_path).
+    Returns:
+        A tuple containing the StreamingMfcc features and the sample rate.
+    """
+    if audio is None:
+        audio = PipelineAudio.from_file(audio_path, cache=True)
+        # Only this call uses the decode; the mapping stays valid after the .npy is deleted
+        audio.release()
+    return StreamingMfcc(audio.samples, audio.sample_rate, n_mfcc=n_mfcc, hop_length=hop_length), audio.sample_rate
+
+def segment_frame_bounds(segments, n_frames, sr, hop_length=512):
+    """
+    Converts segment times to MFCC frame ranges.
+
+    Args:
+        segments(list):  The list of transcription segments.
+        n_frames(int):   The number of MFCC frames.
+        sr(int):         The sample rate of the audio file.
+        hop_length(int): The hop length for the MFCC calculation.
     Returns:
-        A tuple containing the MFCC matrix and the sample rate.
+        A tuple of start and end frame index arrays (end is exclusive; start >= end means no frames).
     """
-    audio, sr = librosa.load(audio_path, sr=None)
-    return librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=n_mfcc, hop_length=hop_length), sr
+    starts = np.array([s['start'] for s in segments], dtype=np.float64) * sr / hop_length
+    ends = np.array([s['end'] for s in segments], dtype=np.float64) * sr / hop_length
+    # astype truncates toward zero like int()
+    return np.maximum(0, starts.astype(np.int64)), np.minimum(n_frames, ends.astype(np.int64))
 
 def analyze_mfcc_segments(mfccs, segments, sr, hop_length=512):
     """
     Aligns the transcription segments with the audio features.
-    Calculates the MFCC statistics for each transcription segment.
+    Calculates the mean of each MFCC coefficient for each transcription segment.
 
     Args:
-        mfccs(numpy.ndarray): The MFCC matrix.
+        mfccs(StreamingMfcc): The MFCC features.
         segments(list):       The list of transcription segments.
         sr(int):              The sample rate of the audio file.
         hop_length(int):      The hop length for the MFCC calculation.
     Returns:
-        A list of dictionaries, each containing the start time, end time, text, duration, and MFCC statistics of a speech segment.
+        A (segments x n_mfcc) array of MFCC means. Segments without frames are all zeros.
     """
-    segment_analysis = []
-    for segment in segments:
-        start_frame = max(0, int(segment['start'] * sr / hop_length))
-        end_frame = min(mfccs.shape[1], int(segment['end'] * sr / hop_length))
+    if not segments:
+        return np.zeros((0, mfccs.n_mfcc))
+    start_frames, end_frames = segment_frame_bounds(segments, mfccs.n_frames, sr, hop_length)
+    return mfccs.range_means(start_frames, end_frames)
 
-        coeffs = {}
-        if start_frame < end_frame:
-            segment_mfccs = mfccs[:, start_frame:end_frame]
-            coeffs = {f'coeff_{i}_mean': float(np.mean(segment_mfccs[i, :])) for i in range(mfccs.shape[0])}
-        else:
-            coeffs = {f'coeff_{i}_mean': 0.0 for i in range(mfccs.shape[0])}
+def vote_clustering(features, num_speakers=2):
+    """
+    Splits feature rows into two acoustic groups by an above/below-average vote.
+    A row is in group A (label 0) when more of its coefficients are above the global averages than below.
+    Ties go to group A, the same as the argmax the word-level path takes over these scores.
 
-        segment_analysis.append({
-            'start': segment['start'], 'end': segment['end'],
-            'duration': segment['duration'], 'text': segment['text'], **coeffs
-        })
-    return segment_analysis
+    Args:
+        features(numpy.ndarray): A (rows x n_mfcc) array of MFCC means.
+        num_speakers(int):       Must be 2.
+    Returns:
+        A tuple of labels and a (rows x 2) score array (higher means closer to that group).
+    """
+    if num_speakers != 2:
+        raise ValueError("The vote backend only separates two speakers, use 'kmeans'")
+    above_count = (features > features.mean(axis=0)).sum(axis=1)
+    votes = (2 * above_count - features.shape[1]).astype(np.float64)
+    scores = np.column_stack([votes, -votes])
+    return scores.argmax(axis=1), scores
+
+def kmeans_speaker_clustering(features, num_speakers=2, seed=0):
+    """
+    Clusters standardized feature rows with seeded k-means++.
+
+    Args:
+        features(numpy.ndarray): A (rows x n_mfcc) array of MFCC means.
+        num_speakers(int):       The number of clusters.
+        seed(int):               Seed for k-means++ initialization (same input, same labels).
+    Returns:
+        A tuple of labels and a (rows x num_speakers) score array (negative squared distances).
+    """
+    std = features.std(axis=0)
+    scaled = (features - features.mean(axis=0)) / np.where(std > 0, std, 1.0)
+    labels, centroids = kmeans_clustering(scaled, k=num_speakers, seed=seed)
+    distances = squared_distances(scaled, centroids)
+    # Fewer rows than speakers leaves clusters without a centroid; score them below every real one
+    scores = np.full((len(scaled), num_speakers), -(distances.max(initial=0.0) + 1.0))
+    scores[:, :len(centroids)] = -distances
+    return labels, scores
+
+# Clustering backends selectable in speaker_separation(clustering=...)
+CLUSTERING_BACKENDS = {
+    'vote': vote_clustering,
+    'kmeans': kmeans_speaker_clustering,
+}
+
+def get_clustering_backend(name):
+    if name not in CLUSTERING_BACKENDS:
+        raise ValueError(f"Unknown clustering backend '{name}' (expected one of {sorted(CLUSTERING_BACKENDS)})")
+    return CLUSTERING_BACKENDS[name]
+
+def check_separation_config(clustering, num_speakers):
+    """
+    Validates a clustering backend and speaker count before any audio is processed.
+
+    Raises:
+        ValueError: if the backend is unknown or can't separate num_speakers speakers.
+    """
+    get_clustering_backend(clustering)
+    if num_speakers < 2:
+        raise ValueError(f"Speaker count must be at least 2, got {num_speakers}")
+    if clustering == 'vote' and num_speakers != 2:
+        raise ValueError(f"The vote backend only separates two speakers, {num_speakers} needs 'kmeans'")
 
-def classify_speakers(segment_analysis):
+def assign_speakers(segments, labels, num_speakers=2):
+    """
+    Assigns acoustic clusters to dispatcher and callers.
+    The cluster with the most questions (?) is the dispatcher (ties go to the lowest label), and
+    long-form questions (3+ words) are moved to the dispatcher. The remaining clusters are callers,
+    ordered by speaking time: 'caller', then 'caller_2', 'caller_3', ...
+
+    Args:
+        segments(list):        The list of transcription segments.
+        labels(numpy.ndarray): Cluster label of each segment.
+        num_speakers(int):     The number of clusters.
+    Returns:
+        A dictionary containing the list of dispatcher and caller segments.
+    """
+    labels = np.asarray(labels)
+    is_question = np.array(['?' in s['text'] for s in segments], dtype=bool)
+    questions = np.bincount(labels[is_question], minlength=num_speakers)
+    dispatcher = int(np.argmax(questions))
+
+    durations = np.bincount(labels, weights=[s['duration'] for s in segments], minlength=num_speakers)
+    callers = [c for c in np.argsort(-durations, kind='stable') if c != dispatcher]
+    names = {c: 'caller' if i == 0 else f'caller_{i + 1}' for i, c in enumerate(callers)}
+
+    word_counts = np.array([len(s['text'].split()) for s in segments])
+    is_dispatcher = (labels == dispatcher) | (is_question & (word_counts >= 3))
+
+    speaker_segments = {'dispatcher': [], 'caller': []}
+    speaker_segments.update({names[c]: [] for c in callers})
+    for segment, label, dispatcher_segment in zip(segments, labels, is_dispatcher):
+        speaker_segments['dispatcher' if dispatcher_segment else names[label]].append(segment)
+    return speaker_segments
+
+def classify_speakers(segments, features, clustering='vote', num_speakers=2):
     """
     Classifies speech segments using acoustic grouping followed by linguistic assignment.
 
-    Step 1 - Acoustic Grouping:
+    Step 1 - Acoustic Grouping (clustering='vote'):
     - Calculate global average for each MFCC coefficient across all segments
     - For each segment, count coefficients above/below global averages
     - Group A: segments with more coefficients above global averages
     - Group B: segments with more coefficients below global averages
+    With clustering='kmeans' the groups are num_speakers k-means clusters instead.
 
     Step 2 - Speaker Assignment:
     - Count questions (?) in each acoustic group
     - Group with more questions = dispatcher
-    - Other group = caller
+    - Other groups = callers
     - Long-form questions (3+ words) get moved to dispatcher
 
     Args:
-        segment_analysis(list): The list of transcription segments with MFCC statistics.
+        segments(list):           The list of transcription segments.
+        features(numpy.ndarray):  The (segments x n_mfcc) MFCC means from analyze_mfcc_segments.
+        clustering(str):          Clustering backend ('vote' or 'kmeans').
+        num_speakers(int):        The number of speakers to separate.
     Returns:
         A dictionary containing the list of dispatcher and caller segments.
     """
-    if not segment_analysis:
+    if not segments:
         return {'dispatcher': [], 'caller': []}
+    labels, _ = get_clustering_backend(clustering)(features, num_speakers)
+    return assign_speakers(segments, labels, num_speakers)
 
-    global_averages = {}
-    for i in range(13):
-        coeff_name = f'coeff_{i}_mean'
-        values = [segment[coeff_name] for segment in segment_analysis]
-        global_averages[coeff_name] = sum(values) / len(values)
-
-    group_a_segments = []
-    group_b_segments = []
-
-    for segment in segment_analysis:
-        above_count = 0
-        below_count = 0
-
-        for i in range(13):
-            coeff_name = f'coeff_{i}_mean'
-            if segment[coeff_name] > global_averages[coeff_name]:
-                above_count += 1
-            else:
-                below_count += 1
-
-        if above_count > below_count:
-            group_a_segments.append(segment)
-            segment['_acoustic_group'] = 'A'
-        else:
-            group_b_segments.append(segment)
-            segment['_acoustic_group'] = 'B'
+def word_units(segments):
+    """
+    Flattens segments into word units with timestamps.
+    Words WhisperX could not align (e.g. numbers) get the end of the previous word and the start of
+    the next one. Segments without words become a single unit.
+
+    Args:
+        segments(list): Transcription segments loaded with include_words=True.
+    Returns:
+        A tuple of (units, start times, end times, segment index of each unit).
+    """
+    units, starts, ends, owners = [], [], [], []
+    for index, segment in enumerate(segments):
+        words = [w for w in segment.get('words', []) if w.get('word', '').strip()]
+        if not words:
+            units.append(segment['text'])
+            starts.append(segment['start'])
+            ends.append(segment['end'])
+            owners.append(index)
+            continue
+
+        first = len(starts)
+        for w in words:
+            units.append(w['word'].strip())
+            starts.append(w.get('start', np.nan))
+            ends.append(w.get('end', np.nan))
+            owners.append(index)
+
+        # Fill missing times from the neighbouring words, bounded by the segment
+        seg_starts = np.array(starts[first:], dtype=np.float64)
+        seg_ends = np.array(ends[first:], dtype=np.float64)
+        prev_end = np.fmax.accumulate(np.concatenate([[segment['start']], seg_ends[:-1]]))
+        prev_end[np.isnan(prev_end)] = segment['start']
+        next_start = np.fmin.accumulate(np.concatenate([seg_starts[1:], [segment['end']]])[::-1])[::-1]
+        next_start[np.isnan(next_start)] = segment['end']
+        starts[first:] = np.where(np.isnan(seg_starts), prev_end, seg_starts).tolist()
+        ends[first:] = np.where(np.isnan(seg_ends), next_start, seg_ends).tolist()
+
+    return units, np.array(starts), np.array(ends), np.array(owners)
+
+def smooth_word_votes(votes, owners, window=2):
+    """
+    Averages each word's cluster scores over its neighbours in the same segment.
 
-    questions_a = sum(1 for s in group_a_segments if '?' in s['text'])
-    questions_b = sum(1 for s in group_b_segments if '?' in s['text'])
+    Args:
+        votes(numpy.ndarray):  Per-word (words x clusters) scores from a clustering backend.
+        owners(numpy.ndarray): Segment index of each word (non-decreasing).
+        window(int):           Words on each side included in the average.
+    Returns:
+        The smoothed scores.
+    """
+    n = len(votes)
+    prefix = np.zeros((n + 1, votes.shape[1]), dtype=np.float64)
+    prefix[1:] = np.cumsum(votes, axis=0, dtype=np.float64)
+    index = np.arange(n)
+    seg_first = np.searchsorted(owners, owners, side='left')
+    seg_last = np.searchsorted(owners, owners, side='right')
+    lo = np.maximum(index - window, seg_first)
+    hi = np.minimum(index + window + 1, seg_last)
+    return (prefix[hi] - prefix[lo]) / (hi - lo)[:, None]
+
+def mfcc_word_scorer(mfccs, clustering='vote', num_speakers=2):
+    """
+    Builds a word scorer for split_segments_by_speaker from MFCC features.
+    Every word's MFCC means come from the same single streaming pass as the segment features, and
+    the clustering backend scores each word against every acoustic cluster.
 
-    if questions_a >= questions_b:
-        dispatcher_group = 'A'
-    else:
-        dispatcher_group = 'B'
+    Args:
+        mfccs(StreamingMfcc):  The MFCC features.
+        clustering(str):       Clustering backend ('vote' or 'kmeans').
+        num_speakers(int):     The number of speakers to separate.
+    Returns:
+        A function (start times, end times) -> (words x num_speakers) scores.
+    """
+    def score(starts, ends):
+        return get_clustering_backend(clustering)(mfccs.time_range_means(starts, ends), num_speakers)[1]
+    return score
 
-    for segment in segment_analysis:
-        segment['_predicted_speaker'] = 'dispatcher' if segment['_acoustic_group'] == dispatcher_group else 'caller'
+def split_segments_by_speaker(segments, score_words, window=2, min_words=3):
+    """
+    Splits segments where the speaker changes mid-segment, using word timestamps.
 
-    for segment in segment_analysis:
-        if (segment.get('_predicted_speaker') == 'caller' and
-            '?' in segment['text']):
-            word_count = len(segment['text'].split())
-            if word_count >= 3:
-                segment['_predicted_speaker'] = 'dispatcher'
+    Each word is scored against every speaker, scores are smoothed over neighbouring words of the
+    same segment, and a segment is split where the best speaker changes. Runs shorter than
+    min_words are merged into the run before them, and the merged piece is voted again.
 
-    return {
-        'dispatcher': [s for s in segment_analysis if s.get('_predicted_speaker') == 'dispatcher'],
-        'caller': [s for s in segment_analysis if s.get('_predicted_speaker') == 'caller']
-    }
+    Args:
+        segments(list):        Transcription segments loaded with include_words=True.
+        score_words(callable): Function (start times, end times) -> (words x speakers) scores,
+                               e.g. from mfcc_word_scorer or ChannelEnergy.range_db.
+        window(int):           Words on each side used for smoothing.
+        min_words(int):        Shortest run of words kept as its own piece.
+    Returns:
+        A tuple of (pieces, labels) where pieces are segments in the input format (without words)
+        and labels is the speaker index of each piece.
+    """
+    if not segments:
+        return [], np.zeros(0, dtype=np.int64)
+
+    units, starts, ends, owners = word_units(segments)
+    scores = smooth_word_votes(score_words(starts, ends), owners, window)
+    labels = scores.argmax(axis=1)
+
+    # Runs of equal cluster inside a segment
+    boundaries = np.flatnonzero((owners[1:] != owners[:-1]) | (labels[1:] != labels[:-1])) + 1
+    runs = list(zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(units)]])))
+
+    # Merge short runs into their neighbour, then re-vote each piece and join equal neighbours
+    merged = []
+    for lo, hi in runs:
+        if merged and owners[merged[-1][0]] == owners[lo] and \
+                (hi - lo < min_words or merged[-1][1] - merged[-1][0] < min_words):
+            merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+    pieces = []
+    for lo, hi in merged:
+        label = scores[lo:hi].mean(axis=0).argmax()
+        if pieces and owners[pieces[-1][0]] == owners[lo] and pieces[-1][2] == label:
+            pieces[-1][1] = hi
+        else:
+            pieces.append([lo, hi, label])
+
+    result = []
+    for lo, hi, _ in pieces:
+        segment = segments[owners[lo]]
+        whole = (lo == 0 or owners[lo - 1] != owners[lo]) and (hi == len(units) or owners[hi] != owners[lo])
+        start = segment['start'] if whole else float(starts[lo])
+        end = segment['end'] if whole else float(ends[hi - 1])
+        result.append({
+            'start': start, 'end': end,
+            'text': segment['text'] if whole else ' '.join(units[lo:hi]),
+            'duration': end - start
+        })
+    return result, np.array([label for _, _, label in pieces], dtype=np.int64)
 
-def kmeans_clustering(data, k=2, max_iters=100):
+def squared_distances(data, centroids):
+    """Squared Euclidean distance of every row to every centroid, as one (rows x k) array."""
+    distances = ((data ** 2).sum(axis=1)[:, None] - 2 * data @ centroids.T
+                 + (centroids ** 2).sum(axis=1)[None, :])
+    return np.maximum(distances, 0.0)
+
+def kmeans_clustering(data, k=2, max_iters=100, tol=1e-6, seed=0):
     """
     Implements the K-means clustering algorithm to group similar acoustic features.
+    Centroids are seeded with k-means++ from a fixed seed, so the same data always gives the same labels.
 
     Args:
         data(numpy.ndarray): The data points to cluster.
-        k(int):              The number of clusters to create.
+        k(int):              The number of clusters to create (at most the number of points).
         max_iters(int):      The maximum number of iterations to run.
+        tol(float):          Stop once no centroid moves more than this (squared, relative to the data variance).
+        seed(int):           Seed for the k-means++ initialization.
     Returns:
         A tuple containing the cluster labels and the centroids.
     """
+    data = np.asarray(data, dtype=np.float64)
     n_samples = data.shape[0]
-    centroids = data[np.random.choice(n_samples, k, replace=False)]
-
+    k = min(k, n_samples)
+    rng = np.random.default_rng(seed)
+
+    # k-means++: each next centroid is drawn with probability proportional to its squared distance
+    centroids = np.empty((k, data.shape[1]))
+    centroids[0] = data[rng.integers(n_samples)]
+    closest = squared_distances(data, centroids[:1])[:, 0]
+    for i in range(1, k):
+        total = closest.sum()
+        index = rng.choice(n_samples, p=closest / total) if total > 0 else rng.integers(n_samples)
+        centroids[i] = data[index]
+        closest = np.minimum(closest, squared_distances(data, centroids[i:i + 1])[:, 0])
+
+    threshold = tol * max(float(data.var(axis=0).sum()), 1e-12)
+    labels = np.zeros(n_samples, dtype=np.int64)
     for _ in range(max_iters):
-        distances = np.zeros((n_samples, k))
-        for i in range(k):
-            distances[:, i] = np.sum((data - centroids[i])**2, axis=1)
-        labels = np.argmin(distances, axis=1)
+        labels = squared_distances(data, centroids).argmin(axis=1)
 
-        new_centroids = np.zeros_like(centroids)
-        for i in range(k):
-            cluster_points = data[labels == i]
-            new_centroids[i] = np.mean(cluster_points, axis=0) if len(cluster_points) > 0 else centroids[i]
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        # Empty clusters keep their previous centroid
+        new_centroids = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
 
-        if np.allclose(centroids, new_centroids):
-            break
+        shift = ((new_centroids - centroids) ** 2).sum(axis=1).max()
         centroids = new_centroids
+        if shift <= threshold:
+            break
 
     return labels, centroids
 
@@ -217,7 +606,7 @@ def create_combined_transcript(speaker_segments, audio_basename, json_filename,
         json_filename(str):     The input JSON filename to extract dispatcher info from.
         output_path(str):       Optional full path for output file. If None, uses directory from json_filename.
     Returns:
-        Saves the final speaker-separated transcript as <audio_basename>.json in the specified directory.
+        The final speaker-separated transcript, also saved as <audio_basename>.json in the specified directory.
     """
     if output_path is None:
         output_dir = os.path.dirname(json_filename)
@@ -231,7 +620,7 @@ def create_combined_transcript(speaker_segments, audio_basename, json_filename,
 
     all_segments = []
     for speaker, segments in speaker_segments.items():
-        speaker_label = dispatcher_name if speaker == 'dispatcher' else 'caller'
+        speaker_label = dispatcher_name if speaker == 'dispatcher' else speaker
         for segment in segments:
             all_segments.append({
                 'speaker': speaker_label, 'start': segment['start'],
@@ -244,54 +633,207 @@ def create_combined_transcript(speaker_segments, audio_basename, json_filename,
         'date': int(date_str) if date_str.isdigit() else 0,
         'time': int(time_str) if time_str.isdigit() else 0,
         'total_segments': len(all_segments),
-        'speakers': [dispatcher_name, 'caller'],
+        'speakers': [dispatcher_name, 'caller'] + [s for s in speaker_segments if s not in ('dispatcher', 'caller')],
         'segments': all_segments
     }
 
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(transcript_data, f, indent=2, ensure_ascii=False)
+    return transcript_data
 
-def speaker_separation(audio_file, transcription_file, output_dir):
+def separate_by_channel(channels, segments, word_level=False):
+    """
+    Assigns segments of a two-channel recording to the channel that is louder over their time span.
+    The channel with more questions is the dispatcher (same rules as assign_speakers).
+
+    Args:
+        channels(ChannelEnergy): Frame energy of both channels.
+        segments(list):          The list of transcription segments (with words if word_level).
+        word_level(bool):        Split segments where the louder channel changes mid-segment.
+    Returns:
+        A dictionary containing the list of dispatcher and caller segments, or None if both channels
+        carry the same audio (mono written as stereo) and the MFCC path has to be used instead.
+    """
+    if not segments:
+        return {'dispatcher': [], 'caller': []}
+
+    starts = np.array([s['start'] for s in segments], dtype=np.float64)
+    ends = np.array([s['end'] for s in segments], dtype=np.float64)
+    levels = channels.range_db(starts, ends)
+    if np.median(np.abs(levels[:, 0] - levels[:, 1])) < STEREO_MIN_SEPARATION_DB:
+        return None
+
+    if word_level:
+        segments, labels = split_segments_by_speaker(segments, channels.range_db)
+    else:
+        labels = levels.argmax(axis=1)
+    return assign_speakers(segments, labels, 2)
+
+def label_by_profile(segments, labels):
+    """Splits segments by voice profile label (0 = dispatcher, 1 = caller)."""
+    return {
+        'dispatcher': [s for s, label in zip(segments, labels) if label == 0],
+        'caller': [s for s, label in zip(segments, labels) if label != 0]
+    }
+
+def update_voice_profiles(profiles, dispatcher_name, mfccs, sr, speaker_segments, segments=None, features=None):
+    """
+    Folds a separated call into the voice profile index.
+
+    Args:
+        profiles(VoiceProfileIndex): The voice profile index.
+        dispatcher_name(str):        Dispatcher of the call.
+        mfccs(StreamingMfcc):        The MFCC features.
+        sr(int):                     The sample rate of the audio file.
+        speaker_segments(dict):      The separated dispatcher and caller segments.
+        segments(list):              Optional segments features was computed for (skips recomputing them).
+        features(numpy.ndarray):     Optional (segments x n_mfcc) MFCC means of segments.
+    """
+    final = speaker_segments['dispatcher'] + speaker_segments['caller']
+    if segments is not None and features is not None:
+        rows = {id(s): i for i, s in enumerate(segments)}
+        final_features = features[[rows[id(s)] for s in final]]
+    else:
+        final_features = analyze_mfcc_segments(mfccs, final, sr)
+    is_dispatcher = np.arange(len(final)) < len(speaker_segments['dispatcher'])
+    profiles.update(dispatcher_name, final_features, is_dispatcher)
+
+def separate_speakers(audio_file, segments, audio=None, word_level=False, clustering='vote', num_speakers=2,
+                      profiles=None):
+    """
+    Classifies segments by speaker, optionally splitting them at word-level speaker changes.
+    Two-channel recordings of two speakers are separated by channel energy. Otherwise segments are
+    labeled by the nearest voice profile once the dispatcher has one that separates the call by a clear
+    margin, and by MFCC clustering otherwise. Only clustered calls update the profiles.
+
+    Args:
+        audio_file(str):        The path to the audio file (named YYYYMMDD_HHMMSS_dispatchername).
+        segments(list):         The list of transcription segments (with words if word_level).
+        audio(PipelineAudio):   Optional audio already decoded by the pipeline.
+        word_level(bool):       Split segments where the speaker changes mid-segment.
+        clustering(str):        Clustering backend ('vote' or 'kmeans').
+        num_speakers(int):      The number of speakers to separate.
+        profiles(VoiceProfileIndex): Optional voice profile index, used and updated for two-speaker calls.
+    Returns:
+        A dictionary containing the list of dispatcher and caller segments.
+    """
+    if num_speakers == 2 and is_two_channel(audio_file):
+        speaker_segments = separate_by_channel(ChannelEnergy(audio_file), segments, word_level)
+        if speaker_segments is not None:
+            print("Separated speakers by stereo channel")
+            return speaker_segments
+
+    mfccs, sr = extract_mfcc_features(audio_file, audio=audio)
+    use_profiles = profiles is not None and profiles.enabled and num_speakers == 2 and bool(segments)
+    _, _, dispatcher_name = extract_dispatcher_name(audio_file)
+    profile = profiles.lookup(dispatcher_name) if use_profiles else None
+
+    features = None
+    if profile is not None:
+        features = analyze_mfcc_segments(mfccs, segments, sr)
+        margin = profiles.margin(features, profile)
+        if margin < profiles.min_margin:
+            print(f"Voice profile of {dispatcher_name} is ambiguous for this call (margin {margin:.2f}), clustering instead")
+            profile = None
+
+    if word_level:
+        if profile is not None:
+            def score_words(starts, ends):
+                return -profiles.distances(mfccs.time_range_means(starts, ends), profile)
+        else:
+            score_words = mfcc_word_scorer(mfccs, clustering, num_speakers)
+        pieces, labels = split_segments_by_speaker(segments, score_words)
+        if not pieces:
+            return {'dispatcher': [], 'caller': []}
+        if profile is not None:
+            speaker_segments = label_by_profile(pieces, labels)
+        else:
+            speaker_segments = assign_speakers(pieces, labels, num_speakers)
+    else:
+        if features is None:
+            features = analyze_mfcc_segments(mfccs, segments, sr)
+        if profile is not None:
+            speaker_segments = label_by_profile(segments, profiles.nearest(features, profile))
+        else:
+            speaker_segments = classify_speakers(segments, features, clustering, num_speakers)
+
+    if profile is not None:
+        # Never fold a profile's own labels back into it
+        print(f"Separated speakers by voice profile of {dispatcher_name}")
+    elif use_profiles:
+        # Word-level pieces are new segments, their features are computed again
+        update_voice_profiles(profiles, dispatcher_name, mfccs, sr, speaker_segments,
+                              None if word_level else segments, None if word_level else features)
+    return speaker_segments
+
+def speaker_separation(audio_file, transcription, output_dir, audio=None, word_level=False,
+                       clustering='vote', num_speakers=2, profiles=None):
     """
     Main function to perform speaker separation on audio and transcription data.
 
     Args:
-        audio_file (str): Path to the audio file (.wav)
-        transcription_file (str): Path to the WhisperX transcription JSON file
+        audio_file (str): Path to the audio file (.wav), named YYYYMMDD_HHMMSS_dispatchername
+        transcription (Transcript or str): In-memory WhisperX transcript, or the path of a WhisperX
+                                           transcription JSON file (then named like the audio file)
         output_dir (str): Directory where the output should be saved
+        audio (PipelineAudio): Optional audio already decoded by the pipeline
+        word_level (bool): Split segments at speaker changes using the aligned words
+        clustering (str): Clustering backend, 'vote' (above/below-average vote) or 'kmeans'
+        num_speakers (int): Speakers in the call; more than 2 needs 'kmeans' (e.g. interpreter, second caller)
+        profiles (VoiceProfileIndex): Optional per-dispatcher voice profile index (used and updated)
+    Returns:
+        The speaker-separated transcript dict (also saved as <output_dir>/<audio_basename>.json)
     """
-    if not os.path.exists(audio_file) or not os.path.exists(transcription_file):
+    check_separation_config(clustering, num_speakers)
+    in_memory = isinstance(transcription, Transcript)
+    if not os.path.exists(audio_file) or not (in_memory or os.path.exists(transcription)):
         raise FileNotFoundError("Audio file or transcription file not found")
 
-    mfccs, sr = extract_mfcc_features(audio_file)
-    segments = load_whisperx_transcription(transcription_file)
-    segment_analysis = analyze_mfcc_segments(mfccs, segments, sr)
-    speaker_segments = classify_speakers(segment_analysis)
+    if in_memory:
+        segments = transcript_segments(transcription, include_words=word_level)
+    else:
+        segments = load_whisperx_transcription(transcription, include_words=word_level)
+    speaker_segments = separate_speakers(audio_file, segments, audio, word_level, clustering, num_speakers, profiles)
 
     # Create output filename based on audio file basename
     audio_basename = os.path.splitext(os.path.basename(audio_file))[0]
 
     # Use the output_dir and create the combined transcript there
+    # (date, time and dispatcher come from the audio name when there is no transcription file)
     output_path = os.path.join(str(output_dir), f"{audio_basename}.json")
-    create_combined_transcript(speaker_segments, audio_basename, transcription_file, output_path)
+    return create_combined_transcript(speaker_segments, audio_basename,
+                                      audio_file if in_memory else transcription, output_path)
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 speaker_separation.py <audio_file> <json_file>")
-        return
-
-    audio_file, json_file = sys.argv[1], sys.argv[2]
-    if not os.path.exists(audio_file) or not os.path.exists(json_file):
+    parser = argparse.ArgumentParser(description="Separate dispatcher and caller speech in a WhisperX transcription")
+    parser.add_argument('audio_file', help='WAV audio file of emergency call')
+    parser.add_argument('json_file', help='WhisperX transcription JSON (YYYYMMDD_HHMMSS_dispatchername.json)')
+    parser.add_argument('--words', action='store_true',
+                        help='Split segments where the speaker changes mid-segment (needs word timestamps)')
+    parser.add_argument('--clustering', default='vote', choices=sorted(CLUSTERING_BACKENDS),
+                        help='Acoustic clustering backend (default: vote)')
+    parser.add_argument('--speakers', type=int, default=2,
+                        help='Speakers in the call; more than 2 needs --clustering kmeans (default: 2)')
+    parser.add_argument('--profiles', action='store_true',
+                        help='Use and update the per-dispatcher voice profile index (backend/cache/voice_profiles.json); '
+                             'needs VOICE_PROFILE_MIN_CALLS > 0')
+    args = parser.parse_args()
+    try:
+        check_separation_config(args.clustering, args.speakers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not os.path.exists(args.audio_file) or not os.path.exists(args.json_file):
         print("Error: File not found")
         return
 
-    mfccs, sr = extract_mfcc_features(audio_file)
-    segments = load_whisperx_transcription(json_file)
-    segment_analysis = analyze_mfcc_segments(mfccs, segments, sr)
-    speaker_segments = classify_speakers(segment_analysis)
+    segments = load_whisperx_transcription(args.json_file, include_words=args.words)
+    speaker_segments = separate_speakers(args.audio_file, segments, None, args.words, args.clustering, args.speakers,
+                                         voice_profiles if args.profiles else None)
 
-    create_combined_transcript(speaker_segments, os.path.splitext(os.path.basename(audio_file))[0], json_file)
+    create_combined_transcript(speaker_segments, os.path.splitext(os.path.basename(args.audio_file))[0],
+                               args.json_file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,189 @@
+"""
+Per-dispatcher voice profile index
+
+Keeps the average MFCC profile of every dispatcher (named by the CDR AGENT_NAME) and of callers
+in general, updated from calls separated by clustering. Once a dispatcher has enough calls on file,
+their segments are labeled by the nearest profile instead of clustering the call from scratch, but
+only when the profiles tell the call's voices apart by a clear margin. Calls labeled by a profile
+never update it, so a wrong label can't reinforce itself. Profiles are off unless
+VOICE_PROFILE_MIN_CALLS is set.
+
+Features are mean-normalized per call (the call's average segment MFCCs are subtracted) so that
+profiles compare voices rather than phone lines or recorder gain.
+
+Usage:
+    profile = voice_profiles.lookup("bjones")
+    if profile is not None and voice_profiles.margin(features, profile) >= voice_profiles.min_margin:
+        labels = voice_profiles.nearest(features, profile)   # 0 = dispatcher, 1 = caller
+    else:
+        labels = cluster(features)
+        voice_profiles.update("bjones", features, labels == 0)
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parents[4] / "cache" / "voice_profiles.json"
+
+# Profile of callers in general (callers differ on every call, dispatchers repeat)
+CALLER_PROFILE = "__caller__"
+
+
+class VoiceProfileIndex:
+    """
+    On-disk index of running-mean voice profiles
+
+    Args:
+        path:          JSON file holding the index
+        min_calls:     Calls a dispatcher needs before their profile is used for labeling (0 disables profiles)
+        min_margin:    Median relative distance margin (0-1) a call needs before its profile labels it
+        max_weight:    Cap on a profile's accumulated segment weight, so profiles keep adapting
+                       (new calls always move the mean by at least 1 / max_weight per segment)
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, min_calls: int = 0, min_margin: float = 0.2,
+                 max_weight: int = 5000):
+        self.path = Path(path)
+        self.min_calls = min_calls
+        self.min_margin = min_margin
+        self.max_weight = max_weight
+        self._lock = threading.Lock()
+        self._profiles = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_calls > 0
+
+    def _load(self) -> Dict:
+        if self._profiles is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._profiles = json.load(f).get('profiles', {})
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._profiles = {}
+        return self._profiles
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'profiles': self._profiles}, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def normalize(features: np.ndarray) -> np.ndarray:
+        """Subtract the call's mean segment features (rows that are all zeros have no audio and are ignored)."""
+        voiced = np.any(features != 0, axis=1)
+        center = features[voiced].mean(axis=0) if voiced.any() else np.zeros(features.shape[1])
+        return features - center
+
+    def lookup(self, dispatcher: str) -> Optional[np.ndarray]:
+        """
+        (2 x n_mfcc) array of the dispatcher and caller profiles, or None if the dispatcher does not
+        have min_calls calls on file yet.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            profiles = self._load()
+            own, caller = profiles.get(dispatcher), profiles.get(CALLER_PROFILE)
+            if own is None or caller is None or own['calls'] < self.min_calls:
+                return None
+            return np.array([own['mean'], caller['mean']], dtype=np.float64)
+
+    def cache_state(self, dispatcher: str) -> Optional[str]:
+        """
+        What a call's profile labels depend on, for transcript cache keys: both profiles' update
+        stamps and min_margin. None when the dispatcher has no ready profile, since the call is then
+        clustered and has to update the profiles, so its transcript must not come from a cache.
+        """
+        with self._lock:
+            profiles = self._load()
+            own, caller = profiles.get(dispatcher), profiles.get(CALLER_PROFILE)
+            if own is None or caller is None or own['calls'] < self.min_calls:
+                return None
+            return (f"{own['calls']}:{own.get('updated')}|{caller['calls']}:{caller.get('updated')}"
+                    f"|margin={self.min_margin}")
+
+    @staticmethod
+    def distances(features: np.ndarray, profile: np.ndarray) -> np.ndarray:
+        """Squared distance of every normalized feature row to each profile, as one (rows x 2) array."""
+        diff = VoiceProfileIndex.normalize(features)[:, None, :] - profile[None, :, :]
+        return (diff ** 2).sum(axis=2)
+
+    def nearest(self, features: np.ndarray, profile: np.ndarray) -> np.ndarray:
+        """Label of the nearest profile for every row: 0 = dispatcher, 1 = caller."""
+        return self.distances(features, profile).argmin(axis=1)
+
+    def margin(self, features: np.ndarray, profile: np.ndarray) -> float:
+        """
+        How clearly the profiles separate a call's segments: median over voiced rows of
+        |d_dispatcher - d_caller| / (d_dispatcher + d_caller). 0 is a coin flip, 1 is certain.
+        """
+        voiced = np.any(features != 0, axis=1)
+        if not voiced.any():
+            return 0.0
+        dist = self.distances(features, profile)[voiced]
+        return float(np.median(np.abs(dist[:, 0] - dist[:, 1]) / (dist.sum(axis=1) + 1e-10)))
+
+    def update(self, dispatcher: str, features: np.ndarray, is_dispatcher: np.ndarray):
+        """
+        Fold one separated call into the dispatcher and caller profiles.
+        Only pass calls labeled independently of the profile (by clustering).
+
+        Args:
+            dispatcher:    Dispatcher name
+            features:      (segments x n_mfcc) MFCC means of the call's segments
+            is_dispatcher: Boolean speaker label of each segment
+        """
+        if not self.enabled or len(features) == 0:
+            return
+        voiced = np.any(features != 0, axis=1)
+        normalized = self.normalize(features)
+        with self._lock:
+            profiles = self._load()
+            for name, rows in ((dispatcher, is_dispatcher & voiced), (CALLER_PROFILE, ~is_dispatcher & voiced)):
+                count = int(rows.sum())
+                if count == 0:
+                    continue
+                call_mean = normalized[rows].mean(axis=0)
+                entry = profiles.get(name)
+                if entry is None or len(entry['mean']) != len(call_mean):
+                    entry = {'mean': call_mean.tolist(), 'weight': 0, 'calls': 0}
+                weight = entry['weight']
+                mean = (np.array(entry['mean']) * weight + call_mean * count) / (weight + count)
+                profiles[name] = {
+                    'mean': mean.tolist(),
+                    'weight': min(weight + count, self.max_weight),
+                    'calls': entry['calls'] + 1,
+                    'updated': datetime.now().isoformat(),
+                }
+            self._save()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            profiles = self._load()
+            dispatchers = {k: v for k, v in profiles.items() if k != CALLER_PROFILE}
+            return {
+                'enabled': self.enabled,
+                'dispatchers': len(dispatchers),
+                'ready': sum(1 for v in dispatchers.values() if v['calls'] >= self.min_calls),
+                'min_calls': self.min_calls,
+                'min_margin': self.min_margin,
+            }
+
+
+# Shared index for the API and the CLI
+# VOICE_PROFILE_PATH: index file, VOICE_PROFILE_MIN_CALLS: calls before a profile is used (0 disables profiles),
+# VOICE_PROFILE_MIN_MARGIN: distance margin a call needs before its profile labels it
+voice_profiles = VoiceProfileIndex(
+    path=os.getenv('VOICE_PROFILE_PATH', str(DEFAULT_INDEX_PATH)),
+    min_calls=int(os.getenv('VOICE_PROFILE_MIN_CALLS', '0')),
+    min_margin=float(os.getenv('VOICE_PROFILE_MIN_MARGIN', '0.2'))
+)
@@ -0,0 +1,74 @@
+"""
+Typed transcript passed between pipeline stages
+
+The transcriber's result is converted to a Transcript once, speaker separation reads it directly,
+and only the final speaker-separated transcript is serialized.
+
+Usage:
+    transcript = Transcript.from_whisperx(transcriber.transcribe(audio_file))
+    data = speaker_separation(audio_file, transcript, output_dir)
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class Word:
+    """One aligned word (start/end are None for words WhisperX could not align, e.g. numbers)"""
+    word: str
+    start: Optional[float] = None
+    end: Optional[float] = None
+    score: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {'word': self.word}
+        for key in ('start', 'end', 'score'):
+            value = getattr(self, key)
+            if value is not None:
+                data[key] = value
+        return data
+
+
+@dataclass
+class Segment:
+    """One transcript segment (speaker is set by speaker separation)"""
+    start: float
+    end: float
+    text: str
+    words: List[Word] = field(default_factory=list)
+    speaker: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class Transcript:
+    """Transcript of one call"""
+    segments: List[Segment]
+    language: str = "unknown"
+    audio_file: Optional[str] = None
+
+    @classmethod
+    def from_whisperx(cls, result: Dict[str, Any]) -> 'Transcript':
+        """Build from a WhisperXTranscriber.transcribe result (or the JSON it was saved as)."""
+        segments = [
+            Segment(
+                start=seg['start'],
+                end=seg['end'],
+                text=seg['text'].strip(),
+                words=[Word(w.get('word', ''), w.get('start'), w.get('end'), w.get('score'))
+                       for w in seg.get('words', [])],
+                speaker=seg.get('speaker')
+            )
+            for seg in result.get('segments', [])
+        ]
+        return cls(segments, language=result.get('language', 'unknown'), audio_file=result.get('audio_file'))
+
+    @classmethod
+    def from_file(cls, json_path) -> 'Transcript':
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return cls.from_whisperx(json.load(f))
@@ -0,0 +1,156 @@
+"""
+Content-addressed transcript cache
+
+Stores finished transcripts on disk keyed by a hash of the decoded audio, the TranscriptionConfig
+and the pipeline version, so re-uploading the same call skips WhisperX and speaker separation.
+
+Usage:
+    key = transcript_cache.make_key(TranscriptCache.audio_hash(audio), config, 'diarized')
+    data = transcript_cache.get(key)
+    if data is None:
+        data = ...
+        transcript_cache.put(key, data)
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Bump whenever transcription or speaker separation output changes, so stale entries are never served
+PIPELINE_VERSION = "3"
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[3] / "cache" / "transcripts"
+
+
+class TranscriptCache:
+    """
+    Size-bounded on-disk cache of transcript JSON
+
+    Entries are evicted least-recently-used first (by file modification time, which is
+    refreshed on every hit) once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def audio_hash(audio) -> str:
+        """SHA-256 of the decoded float32 samples (hashed in place, no copy for contiguous buffers)."""
+        import numpy as np
+        samples = np.ascontiguousarray(audio, dtype=np.float32)
+        return hashlib.sha256(memoryview(samples).cast('B')).hexdigest()
+
+    @staticmethod
+    def make_key(audio_hash: str, config, stage: str, **extra) -> str:
+        """
+        Build a cache key
+
+        Args:
+            audio_hash: TranscriptCache.audio_hash of the decoded audio
+            config:     TranscriptionConfig (or its dict) used to transcribe
+            stage:      Which artifact is cached ('whisperx' raw transcription, 'diarized' final transcript)
+            extra:      Anything else the artifact depends on (e.g. the output name)
+        """
+        config_dict = config.to_dict() if hasattr(config, 'to_dict') else dict(config)
+        payload = json.dumps({
+            'audio': audio_hash,
+            'config': config_dict,
+            'pipeline_version': PIPELINE_VERSION,
+            'stage': stage,
+            'extra': extra,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached transcript, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                os.utime(path)  # Mark as recently used
+                self.hits += 1
+                return data
+            except (FileNotFoundError, json.JSONDecodeError):
+                self.misses += 1
+                return None
+
+    def put(self, key: str, data: Dict[str, Any]):
+        """Store a transcript and evict old entries if over budget."""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate statistics and current disk usage"""
+        with self._lock:
+            entries = self._entries() if self.enabled else []
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(entries),
+                'size_mb': round(sum(size for _, size, _ in entries) / (1024 * 1024), 2),
+                'budget_mb': round(self.max_bytes / (1024 * 1024), 1),
+                'pipeline_version': PIPELINE_VERSION,
+            }
+
+
+# Shared cache for the API and the CLI
+# TRANSCRIPT_CACHE_DIR: where entries are stored, TRANSCRIPT_CACHE_MB: size budget (0 disables the cache)
+transcript_cache = TranscriptCache(
+    cache_dir=os.getenv('TRANSCRIPT_CACHE_DIR', str(DEFAULT_CACHE_DIR)),
+    max_bytes=int(os.getenv('TRANSCRIPT_CACHE_MB', '512')) * 1024 * 1024
+)
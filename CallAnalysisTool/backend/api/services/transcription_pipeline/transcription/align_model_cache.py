@@ -0,0 +1,104 @@
+"""
+Alignment Model Cache
+Keeps WhisperX (wav2vec2) alignment models in memory so they are loaded once per language/device
+instead of once per transcription.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def estimate_model_bytes(model) -> int:
+    """Approximate memory held by a torch model's parameters and buffers."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return 0
+
+
+class AlignModelCache:
+    """
+    LRU registry of alignment models keyed by (language, device, model name)
+
+    Models are evicted least-recently-used first once the estimated memory of all cached
+    models exceeds the budget. The most recently loaded model is always kept.
+    """
+
+    def __init__(self, max_bytes: int = 2048 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._models: 'OrderedDict[Tuple, Tuple[Any, Dict, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, whisperx, language: str, device: str = "cpu", model_name: Optional[str] = None):
+        """
+        Get the alignment model for a language, loading it on a miss.
+
+        Args:
+            whisperx:   The imported whisperx module
+            language:   Language code (e.g. "en")
+            device:     Torch device
+            model_name: Optional alignment model override (TranscriptionConfig.align_model)
+        Returns:
+            Tuple of (align_model, align_metadata) as returned by whisperx.load_align_model
+        """
+        key = (language, device, model_name)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                model, metadata, _ = self._models[key]
+                return model, metadata
+
+            self.misses += 1
+            print(f"Loading alignment model for '{language}' on {device}...")
+            model, metadata = whisperx.load_align_model(
+                language_code=language,
+                device=device,
+                model_name=model_name
+            )
+            self._models[key] = (model, metadata, estimate_model_bytes(model))
+            self._evict()
+            return model, metadata
+
+    def _evict(self):
+        while len(self._models) > 1 and self.total_bytes() > self.max_bytes:
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            print(f"Evicted alignment model: {key}")
+
+    def total_bytes(self) -> int:
+        return sum(size for _, _, size in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the currently cached models"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'cached_models': [
+                    {'language': language, 'device': device, 'model_name': model_name}
+                    for language, device, model_name in self._models
+                ],
+                'memory_mb': round(self.total_bytes() / (1024 * 1024), 1),
+                'budget_mb': round(self.max_bytes / (1024 * 1024), 1),
+            }
+
+
+# Shared by every WhisperXTranscriber in the process
+# ALIGN_MODEL_CACHE_MB: memory budget for cached alignment models
+align_model_cache = AlignModelCache(
+    max_bytes=int(os.getenv('ALIGN_MODEL_CACHE_MB', '2048')) * 1024 * 1024
+)
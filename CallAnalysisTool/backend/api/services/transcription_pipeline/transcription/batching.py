@@ -0,0 +1,163 @@
+"""
+Micro-batching front-end for WhisperXTranscriber
+
+Short 911 calls only produce a few VAD chunks, so a single call rarely fills a WhisperX batch.
+BatchingTranscriber collects the VAD chunks of every call that arrives within a short window,
+decodes them together in one batched pass and hands each caller back its own segments.
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class _PendingRecognition:
+    """VAD chunks of one caller waiting to be decoded"""
+
+    def __init__(self, chunks: list):
+        self.chunks = chunks
+        self.texts: Optional[List[str]] = None
+        self.error: Optional[Exception] = None
+        self.done = threading.Event()
+
+
+class BatchingTranscriber:
+    """
+    Drop-in replacement for WhisperXTranscriber.transcribe that batches chunks across callers
+
+    Args:
+        transcriber:      Loaded WhisperXTranscriber
+        max_wait_ms:      How long the first pending call waits for others to join its batch
+        max_batch_chunks: Stop collecting once this many chunks are pending (default: 4 x batch_size)
+    """
+
+    def __init__(self, transcriber, max_wait_ms: float = 200, max_batch_chunks: Optional[int] = None):
+        self.transcriber = transcriber
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_chunks = max_batch_chunks or transcriber.config.batch_size * 4
+        self._queue: 'queue.Queue[_PendingRecognition]' = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.chunks = 0
+        self.model_passes = 0
+        self._worker = threading.Thread(target=self._run, name='transcription-batcher', daemon=True)
+        self._worker.start()
+
+    @property
+    def config(self):
+        return self.transcriber.config
+
+    def load_audio(self, audio_file: str):
+        return self.transcriber.load_audio(audio_file)
+
+    def transcribe(self, audio_file: str, audio=None) -> Dict:
+        """Transcribe an audio file, sharing the Whisper decoding pass with concurrent callers."""
+        return self.transcriber.transcribe(audio_file, audio=audio, recognize=self.recognize,
+                                           decode_chunks=self.decode_chunks)
+
+    def recognize(self, audio) -> Dict:
+        """Batched equivalent of WhisperXTranscriber.recognize"""
+        if not self.transcriber.can_decode_chunks():
+            # Language detection needs a per-file pass, fall back to the unbatched path
+            return self.transcriber.recognize(audio)
+
+        from whisperx.audio import SAMPLE_RATE
+
+        vad_segments = self.transcriber.vad_chunks(audio)
+        chunks = [audio[int(seg['start'] * SAMPLE_RATE):int(seg['end'] * SAMPLE_RATE)]
+                  for seg in vad_segments]
+
+        segments = [
+            {"text": text, "start": round(seg['start'], 3), "end": round(seg['end'], 3)}
+            for text, seg in zip(self.decode_chunks(chunks), vad_segments)
+        ]
+        return {"segments": segments, "language": self.transcriber.config.language}
+
+    def decode_chunks(self, chunks: list) -> List[str]:
+        """Batched equivalent of WhisperXTranscriber.decode_chunks (also used by tiered refinement)"""
+        if not chunks:
+            return []
+        pending = _PendingRecognition(chunks)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.texts
+
+    def _collect(self) -> List[_PendingRecognition]:
+        """Block for the first pending call, then gather more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        total = len(batch[0].chunks)
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch_chunks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            total += len(pending.chunks)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                all_chunks = [chunk for pending in batch for chunk in pending.chunks]
+                texts = self.transcriber.decode_chunks(all_chunks)
+
+                # Split the decoded texts back to each caller
+                offset = 0
+                for pending in batch:
+                    pending.texts = texts[offset:offset + len(pending.chunks)]
+                    offset += len(pending.chunks)
+
+                with self._stats_lock:
+                    self.batches += 1
+                    self.requests += len(batch)
+                    self.chunks += len(all_chunks)
+                    self.model_passes += math.ceil(len(all_chunks) / self.transcriber.config.batch_size)
+            except Exception as e:
+                print(f"Batched decoding failed: {e}")
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def stats(self) -> Dict:
+        """Batch counters; fill_rate is the average share of batch_size slots used per model pass"""
+        with self._stats_lock:
+            slots = self.model_passes * self.transcriber.config.batch_size
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'chunks': self.chunks,
+                'avg_requests_per_batch': round(self.requests / self.batches, 2) if self.batches else 0.0,
+                'avg_chunks_per_batch': round(self.chunks / self.batches, 2) if self.batches else 0.0,
+                'model_passes': self.model_passes,
+                'fill_rate': round(self.chunks / slots, 3) if slots else 0.0,
+                'window_ms': round(self.max_wait * 1000),
+                'max_batch_chunks': self.max_batch_chunks,
+            }
+
+
+def create_batching_transcriber(transcriber) -> BatchingTranscriber:
+    """
+    Wrap a transcriber with the settings from the environment
+
+    TRANSCRIPTION_BATCH_WINDOW_MS: how long to wait for other calls to join a batch (default: 200)
+    TRANSCRIPTION_BATCH_MAX_CHUNKS: chunks per collected batch (default: 4 x batch_size)
+    """
+    max_chunks = os.getenv('TRANSCRIPTION_BATCH_MAX_CHUNKS')
+    return BatchingTranscriber(
+        transcriber,
+        max_wait_ms=float(os.getenv('TRANSCRIPTION_BATCH_WINDOW_MS', '200')),
+        max_batch_chunks=int(max_chunks) if max_chunks else None
+    )
@@ -0,0 +1,285 @@
+"""
+Transcription Benchmark
+
+Runs WhisperXTranscriber over the bundled call recordings (CallAnalysisTool/Call_Files) for a matrix
+of TranscriptionConfig settings and appends the results to a JSON history file. Each configuration
+runs in its own process so peak RSS is measured per configuration. Runs are compared with the most
+recent earlier run of the same configuration and regressions are flagged. The history is kept in
+the gitignored backend/cache/benchmarks/ (TRANSCRIPTION_BENCHMARK_HISTORY or --history to override).
+
+Usage:
+  python benchmark.py
+  python benchmark.py --models small large-v3 --batch-sizes 8 16 --threads 4 8 --align on off
+  python benchmark.py --vad on off
+  python benchmark.py --limit 5 --fail-on-regression
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import subprocess
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .whisperx_transcriber import TranscriptionConfig, WhisperXTranscriber, find_wav_files
+except ImportError:  # Run directly as a script
+    from whisperx_transcriber import TranscriptionConfig, WhisperXTranscriber, find_wav_files
+
+BACKEND_DIR = Path(__file__).resolve().parents[4]
+DEFAULT_CORPUS = BACKEND_DIR.parent / "Call_Files"
+# Results are machine-specific, so the history lives in the (gitignored) local cache by default
+DEFAULT_HISTORY = Path(os.getenv('TRANSCRIPTION_BENCHMARK_HISTORY',
+                                 str(BACKEND_DIR / "cache" / "benchmarks" / "transcription_history.json")))
+
+
+def config_key(config_dict, threads):
+    """Stable identifier of one matrix cell, used to match runs across history."""
+    return (f"{config_dict['model_size']}|bs={config_dict['batch_size']}|{config_dict['compute_type']}"
+            f"|threads={threads}|align={'on' if config_dict['word_timestamps'] else 'off'}"
+            f"|vad={'on' if config_dict['vad_filter'] else 'off'}")
+
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_config(config_dict, threads, audio_files):
+    """Benchmark one configuration (runs in a fresh process)."""
+    if threads:
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ[var] = str(threads)
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+
+    config = TranscriptionConfig(**config_dict)
+    transcriber = WhisperXTranscriber(config, cpu_threads=threads or None)
+
+    start = time.perf_counter()
+    transcriber.load_model()
+    transcriber.preload_align_model()
+    load_seconds = time.perf_counter() - start
+
+    files = []
+    for audio_file in audio_files:
+        audio = transcriber.load_audio(audio_file)
+        start = time.perf_counter()
+        result = transcriber.transcribe(audio_file, audio=audio)
+        wall = time.perf_counter() - start
+        audio_seconds = len(audio) / 16000
+        files.append({
+            'audio_file': os.path.basename(audio_file),
+            'audio_seconds': round(audio_seconds, 2),
+            'wall_seconds': round(wall, 3),
+            'real_time_factor': round(wall / audio_seconds, 4) if audio_seconds else 0.0,
+            'segments': result['num_segments'],
+        })
+
+    audio_total = sum(f['audio_seconds'] for f in files)
+    wall_total = sum(f['wall_seconds'] for f in files)
+    return {
+        'config_key': config_key(config_dict, threads),
+        'config': config_dict,
+        'threads': threads,
+        'num_files': len(files),
+        'load_seconds': round(load_seconds, 2),
+        'audio_seconds': round(audio_total, 2),
+        'wall_seconds': round(wall_total, 2),
+        # Processing time per second of audio (lower is faster)
+        'real_time_factor': round(wall_total / audio_total, 4) if audio_total else 0.0,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'segments': sum(f['segments'] for f in files),
+        'files': files,
+    }
+
+
+def build_matrix(models, batch_sizes, compute_types, threads, align, vad=(False,)):
+    """All combinations of the requested settings as (config_dict, threads)."""
+    matrix = []
+    for model, batch_size, compute_type, thread_count, align_on, vad_on in itertools.product(
+            models, batch_sizes, compute_types, threads, align, vad):
+        config = TranscriptionConfig(
+            model_size=model,
+            batch_size=batch_size,
+            compute_type=compute_type,
+            word_timestamps=align_on,
+            vad_filter=vad_on
+        )
+        matrix.append((config.to_dict(), thread_count))
+    return matrix
+
+
+def load_history(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'runs': []}
+
+
+def find_regressions(history, results, threshold=0.1):
+    """
+    Compare results with the latest earlier run of each configuration.
+
+    A configuration regresses if its real-time factor or peak RSS grew by more than threshold
+    (fraction), or if it produced a different number of segments on the same files.
+    """
+    regressions = []
+    for result in results:
+        previous = None
+        for run in reversed(history.get('runs', [])):
+            previous = next((r for r in run['results'] if r['config_key'] == result['config_key']), None)
+            if previous:
+                break
+        if not previous or previous['num_files'] != result['num_files']:
+            continue
+
+        for metric in ('real_time_factor', 'peak_rss_mb'):
+            before, after = previous[metric], result[metric]
+            if before and (after - before) / before > threshold:
+                regressions.append({
+                    'config_key': result['config_key'],
+                    'metric': metric,
+                    'previous': before,
+                    'current': after,
+                    'change': f"{(after - before) / before * 100:+.1f}%",
+                })
+        if previous['segments'] != result['segments']:
+            regressions.append({
+                'config_key': result['config_key'],
+                'metric': 'segments',
+                'previous': previous['segments'],
+                'current': result['segments'],
+                'change': f"{result['segments'] - previous['segments']:+d}",
+            })
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BACKEND_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(audio_files, matrix, history_path=DEFAULT_HISTORY, threshold=0.1):
+    """
+    Benchmark every configuration in the matrix and append the run to the history file.
+
+    Returns:
+        Tuple of (run record, list of regressions)
+    """
+    results = []
+    for i, (config_dict, threads) in enumerate(matrix, 1):
+        print(f"\n[{i}/{len(matrix)}] {config_key(config_dict, threads)}")
+        # A fresh process per configuration keeps model memory and peak RSS separate
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            try:
+                result = executor.submit(_run_config, config_dict, threads, audio_files).result()
+            except Exception as e:
+                print(f"[ERROR] Failed: {e}")
+                continue
+        print(f"  RTF: {result['real_time_factor']}  Wall: {result['wall_seconds']}s  "
+              f"Peak RSS: {result['peak_rss_mb']} MB  Segments: {result['segments']}")
+        results.append(result)
+
+    history = load_history(history_path)
+    regressions = find_regressions(history, results, threshold)
+
+    run = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'host': {'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'corpus': [os.path.basename(f) for f in audio_files],
+        'results': results,
+        'regressions': regressions,
+    }
+    history['runs'].append(run)
+
+    history_path = Path(history_path)
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+    return run, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark WhisperX transcription over the bundled call recordings",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default configuration over the whole corpus
+  python benchmark.py
+
+  # Compare model sizes and thread counts on the first 5 calls
+  python benchmark.py --models small large-v3 --threads 4 8 --limit 5
+
+  # Exit with an error if anything regressed by more than 10%
+  python benchmark.py --fail-on-regression --threshold 0.1
+        """
+    )
+    parser.add_argument('inputs', nargs='*', default=[str(DEFAULT_CORPUS)],
+                        help='Audio file(s) or directories (default: CallAnalysisTool/Call_Files)')
+    parser.add_argument('--models', nargs='+', default=['large-v3'], help='Model sizes')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[16], help='Batch sizes')
+    parser.add_argument('--compute-types', nargs='+', default=['int8'],
+                        help='CTranslate2 compute types (e.g. int8 float32)')
+    parser.add_argument('--threads', nargs='+', type=int, default=[0],
+                        help='CPU thread counts (0: library default)')
+    parser.add_argument('--align', nargs='+', choices=['on', 'off'], default=['on'],
+                        help='Word alignment on/off')
+    parser.add_argument('--vad', nargs='+', choices=['on', 'off'], default=['off'],
+                        help='VAD pre-pass (skip non-speech audio) on/off')
+    parser.add_argument('--limit', type=int, help='Only use the first N recordings')
+    parser.add_argument('--history', default=str(DEFAULT_HISTORY),
+                        help='JSON history file (default: $TRANSCRIPTION_BENCHMARK_HISTORY or '
+                             'backend/cache/benchmarks/transcription_history.json)')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown/memory growth flagged as a regression (default: 0.1)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 if a regression is flagged')
+    args = parser.parse_args()
+
+    audio_files = sorted(set(find_wav_files(args.inputs)))
+    if args.limit:
+        audio_files = audio_files[:args.limit]
+    if not audio_files:
+        print("Error: No .wav files found!")
+        sys.exit(1)
+
+    matrix = build_matrix(args.models, args.batch_sizes, args.compute_types, args.threads,
+                          [a == 'on' for a in args.align], [v == 'on' for v in args.vad])
+    print(f"Benchmarking {len(matrix)} configuration(s) over {len(audio_files)} recording(s)")
+
+    run, regressions = run_benchmark(audio_files, matrix, args.history, args.threshold)
+
+    print(f"\n{'=' * 80}")
+    print(f"Saved run to: {args.history}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) flagged:")
+        for r in regressions:
+            print(f"  - {r['config_key']}: {r['metric']} {r['previous']} -> {r['current']} ({r['change']})")
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print("No regressions flagged")
+    print(f"{'=' * 80}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+Streaming (live) transcription
+
+Audio arrives as raw PCM frames. feed() only appends them to the session; a worker thread per
+session decodes the audio received since its last pass (plus overlap_s of already decoded audio,
+so words cut at the edge are heard whole) with the preloaded WhisperX model and splits the result into:
+    final   - segments that end at least stability_s before the newest audio, or that started
+              before the overlap and will not be decoded again (emitted once)
+    partial - the tail, which may still change on the next pass
+
+Every pass merges its result into one pending update (the new finals plus the latest partial
+segments), read as server-sent events (updates()) or with the next audio POST (drain()). The step between passes follows the measured decode time (step_factor x the smoothed
+decode time, between min_step_s and max_step_s), so the worker keeps up with the stream as long as
+the transcriber can. A segment shows up about one step plus one decode after its audio arrives and
+turns final stability_s later; when decoding is slower than real time even at max_step_s (e.g. a
+busy shared transcriber) audio queues up, but never more than max_backlog_s of it: feed() then
+blocks until the worker catches up and raises StreamBacklogFull if it doesn't in time, so latency
+and memory stay bounded however long the call is. One pass decodes at most max_window_s of audio.
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000  # WhisperX input rate
+
+
+def pcm16_to_float32(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Convert 16-bit little-endian mono PCM to float32 at 16 kHz."""
+    if len(data) % 2:
+        data = data[:-1]
+    audio = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    if sample_rate != SAMPLE_RATE and len(audio):
+        # Linear resampling is enough for telephone-band speech
+        duration = len(audio) / sample_rate
+        target = np.arange(int(round(duration * SAMPLE_RATE))) / SAMPLE_RATE
+        audio = np.interp(target, np.arange(len(audio)) / sample_rate, audio).astype(np.float32)
+    return audio
+
+
+class StreamBacklogFull(RuntimeError):
+    """Raised when a stream already holds max_backlog_s of undecoded audio"""
+
+
+def _normalize_word(word: str) -> str:
+    return "".join(re.findall(r"[\w']+", word.lower()))
+
+
+def strip_overlap(previous: str, text: str, max_words: int = 8) -> str:
+    """Drop the words at the start of text that repeat the end of previous (the re-decoded overlap)."""
+    tail = [_normalize_word(w) for w in previous.split()][-max_words:]
+    words = text.split()
+    head = [_normalize_word(w) for w in words[:max_words]]
+    for n in range(min(len(tail), len(head)), 0, -1):
+        if tail[-n:] == head[:n]:
+            return " ".join(words[n:])
+    return text
+
+
+class StreamingSession:
+    """
+    One live transcription stream
+
+    Args:
+        transcriber:  Object with recognize(audio) -> {'segments': [...], 'language': ...}
+        sample_rate:  Sample rate of the incoming PCM
+        min_step_s:   Shortest step (new audio) between decodes
+        max_step_s:   Longest step between decodes
+        step_factor:  Step as a multiple of the smoothed decode time
+        overlap_s:    Already decoded audio decoded again at the start of each pass
+        stability_s:  A segment is final once it ends at least this far before the newest audio
+        max_window_s: Most audio decoded in one pass (Whisper decodes <= 30 s windows)
+        max_backlog_s: Most undecoded audio held; feed() waits for the worker beyond it
+    """
+
+    def __init__(self, transcriber, sample_rate: int = SAMPLE_RATE, min_step_s: float = 0.5,
+                 max_step_s: float = 5.0, step_factor: float = 1.5, overlap_s: float = 1.5,
+                 stability_s: float = 1.5, max_window_s: float = 30.0, max_backlog_s: float = 60.0):
+        self.session_id = uuid.uuid4().hex
+        self.transcriber = transcriber
+        self.sample_rate = sample_rate
+        self.min_step = min_step_s
+        self.max_step = max_step_s
+        self.step_factor = step_factor
+        self.overlap = overlap_s
+        self.stability = stability_s
+        self.max_window = max(max_window_s, 2 * overlap_s)
+        self.max_backlog = max(max_backlog_s, max_step_s)
+
+        # Received audio as a list of chunks, so appending never copies what is already buffered
+        self._chunks: 'deque[np.ndarray]' = deque()
+        self._buffered = 0               # Samples in _chunks
+        self.buffer_start = 0.0          # Stream time (s) of the first buffered sample
+        self.decoded_until = 0.0         # Stream time (s) the last pass decoded up to
+        self.total_samples = 0
+        self.partial: List[Dict] = []
+        self.last_final: Optional[Dict] = None
+        self.step = min_step_s
+        self.decode_seconds: Optional[float] = None
+        self.finals_emitted = 0
+        self.decodes = 0
+        self.closed = False              # No more audio accepted
+        self.finished = False            # Last update published
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.last_activity = self.created_at
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)      # Worker: audio arrived or stream closed
+        self._room = threading.Condition(self._lock)      # feed(): backlog shrank
+        self._updated = threading.Condition(self._lock)   # updates(): pending update changed
+        self._pending: Optional[Dict] = None
+        self._worker = threading.Thread(target=self._run, name=f'stream-{self.session_id[:8]}', daemon=True)
+        self._worker.start()
+
+    @property
+    def stream_time(self) -> float:
+        return self.total_samples / SAMPLE_RATE
+
+    @property
+    def backlog_seconds(self) -> float:
+        """Received audio the worker has not decoded yet"""
+        return self.stream_time - self.decoded_until
+
+    def feed(self, data: bytes, timeout: float = 10.0) -> None:
+        """
+        Append PCM bytes; the session's worker decodes them once a step of audio is buffered.
+        Waits up to timeout seconds while max_backlog_s of audio is still undecoded.
+
+        Raises:
+            StreamBacklogFull: if the worker did not catch up in time (nothing was appended)
+        """
+        audio = pcm16_to_float32(data, self.sample_rate)
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                if self.error is not None:
+                    raise RuntimeError(self.error)
+                if self.closed:
+                    raise ValueError("Stream session is closed")
+                if self.backlog_seconds + len(audio) / SAMPLE_RATE <= self.max_backlog:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or len(audio) / SAMPLE_RATE > self.max_backlog:
+                    raise StreamBacklogFull(
+                        f"Stream is {self.backlog_seconds:.1f}s behind (limit {self.max_backlog:g}s)")
+                self._room.wait(remaining)
+            self.last_activity = time.time()
+            self._chunks.append(audio)
+            self._buffered += len(audio)
+            self.total_samples += len(audio)
+            self._wake.notify()
+
+    def finish(self) -> Dict:
+        """Stop accepting audio, wait for the rest to be decoded and finalize every remaining segment."""
+        with self._lock:
+            self.closed = True
+            self._wake.notify()
+        self._worker.join()
+        return self.drain()
+
+    def abort(self, reason: str):
+        """End the stream without decoding what is left (e.g. it expired)."""
+        with self._lock:
+            if self.finished:
+                return
+            self.closed = True
+            self.error = reason
+            self._publish([])
+            self._wake.notify()
+            self._room.notify_all()
+
+    def drain(self) -> Dict:
+        """Everything finalized since the last drain or event, with the current partial segments."""
+        with self._lock:
+            final = self._pending['final'] if self._pending is not None else []
+            self._pending = None
+            return self._state(final)
+
+    def updates(self, keepalive_s: float = 15.0) -> Iterator[Optional[Dict]]:
+        """
+        Block for updates as the worker produces them, until the stream is finished.
+        Yields None every keepalive_s without an update.
+        """
+        while True:
+            with self._lock:
+                if self._pending is None and not self.finished:
+                    self._updated.wait(keepalive_s)
+                update, self._pending = self._pending, None
+                finished = self.finished
+            if update is not None:
+                yield update
+                if update['closed']:
+                    return
+            elif finished:
+                return  # The last update went to drain()
+            else:
+                yield None
+
+    def _state(self, final: List[Dict]) -> Dict:
+        state = {
+            'session_id': self.session_id,
+            'final': final,
+            'partial': list(self.partial),
+            'stream_time': round(self.stream_time, 3),
+            'decoded_until': round(self.decoded_until, 3),
+            'closed': self.finished,
+        }
+        if self.error is not None:
+            state['error'] = self.error
+        return state
+
+    def _publish(self, final: List[Dict]):
+        if self.closed and self.error is None and self.decoded_until >= self.stream_time:
+            self.finished = True
+        elif self.error is not None:
+            self.finished = True
+        self.finals_emitted += len(final)
+        # Merge into the update nobody has read yet: all finals, but only the latest partial segments
+        if self._pending is not None:
+            final = self._pending['final'] + final
+        self._pending = self._state(final)
+        self._updated.notify_all()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self.closed and self.stream_time - self.decoded_until < self.step:
+                    self._wake.wait()
+                if self.finished:
+                    return
+                if self.closed and self.decoded_until >= self.stream_time:
+                    # Nothing new to decode, the partial segments are as good as they get
+                    final = [dict(seg, final=True) for seg in self.partial]
+                    self.partial = []
+                    if final:
+                        self.last_final = final[-1]
+                    self._publish(final)
+                    return
+                # Decode from overlap_s before the last pass, at most max_window_s at a time
+                start = max(self.buffer_start, self.decoded_until - self.overlap)
+                end = min(self.stream_time, start + self.max_window)
+                first = int(round((start - self.buffer_start) * SAMPLE_RATE))
+                audio = self._read(first, int(round((end - start) * SAMPLE_RATE)))
+                flush = self.closed and end >= self.stream_time
+
+            began = time.perf_counter()
+            try:
+                result = self.transcriber.recognize(audio) if len(audio) else {'segments': []}
+            except Exception as e:
+                print(f"Error transcribing stream {self.session_id}: {e}")
+                self.abort(f"Stream transcription failed: {e}")
+                return
+            elapsed = time.perf_counter() - began
+
+            with self._lock:
+                if self.finished:
+                    return
+                self._adapt_step(elapsed)
+                self._publish(self._apply(result, start, end, flush))
+                self._room.notify_all()
+                if self.finished:
+                    return
+
+    def _adapt_step(self, elapsed: float):
+        """Next step = step_factor x smoothed decode time, so decoding keeps pace with the stream."""
+        self.decodes += 1
+        if self.decode_seconds is None:
+            self.decode_seconds = elapsed
+        else:
+            self.decode_seconds = 0.7 * self.decode_seconds + 0.3 * elapsed
+        self.step = min(max(self.decode_seconds * self.step_factor, self.min_step), self.max_step)
+
+    def _apply(self, result: Dict, start: float, end: float, flush: bool) -> List[Dict]:
+        """Merge one pass over [start, end] into the partial segments and return the new final ones."""
+        segments = [
+            {
+                'start': round(start + seg['start'], 3),
+                'end': round(start + seg['end'], 3),
+                'text': seg['text'].strip(),
+            }
+            for seg in result.get('segments', [])
+            if seg['text'].strip()
+        ]
+
+        # Partial segments that start before this pass will not be decoded again: commit them as they are
+        final = [dict(seg, final=True) for seg in self.partial if seg['start'] < start]
+        previous = final[-1] if final else self.last_final
+        if previous is not None:
+            # The overlap repeats the end of the previous segment
+            segments = [seg for seg in segments if seg['end'] > previous['end']]
+            if segments and segments[0]['start'] < previous['end']:
+                text = strip_overlap(previous['text'], segments[0]['text'])
+                if text:
+                    segments[0] = dict(segments[0], start=previous['end'], text=text)
+                else:
+                    segments = segments[1:]
+
+        partial = []
+        for i, seg in enumerate(segments):
+            stable = seg['end'] <= end - self.stability and i < len(segments) - 1
+            if flush or stable:
+                final.append(dict(seg, final=True))
+            else:
+                partial.append(dict(seg, final=False))
+
+        self.partial = partial
+        self.decoded_until = end
+        if final:
+            self.last_final = final[-1]
+        self._trim(end - self.overlap)
+        return final
+
+    def _read(self, first: int, count: int) -> np.ndarray:
+        """Copy count buffered samples starting at sample first (only the decoded window is copied)."""
+        parts, offset, last = [], 0, first + count
+        for chunk in self._chunks:
+            if offset >= last:
+                break
+            if offset + len(chunk) > first:
+                parts.append(chunk[max(first - offset, 0):last - offset])
+            offset += len(chunk)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def _trim(self, keep_from: float):
+        drop = int(round((keep_from - self.buffer_start) * SAMPLE_RATE))
+        drop = min(max(drop, 0), self._buffered)
+        self._buffered -= drop
+        self.buffer_start += drop / SAMPLE_RATE
+        while drop:
+            chunk = self._chunks[0]
+            if len(chunk) <= drop:
+                self._chunks.popleft()
+                drop -= len(chunk)
+            else:
+                self._chunks[0] = chunk[drop:]
+                drop = 0
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'session_id': self.session_id,
+                'sample_rate': self.sample_rate,
+                'stream_time': round(self.stream_time, 3),
+                'decoded_until': round(self.decoded_until, 3),
+                'buffered_seconds': round(self._buffered / SAMPLE_RATE, 3),
+                'backlog_seconds': round(self.backlog_seconds, 3),
+                'partial': list(self.partial),
+                'finals_emitted': self.finals_emitted,
+                'decodes': self.decodes,
+                'step_s': round(self.step, 3),
+                'decode_ms': round(self.decode_seconds * 1000, 1) if self.decode_seconds is not None else None,
+                'closed': self.closed,
+                'error': self.error,
+            }
+
+
+class StreamingSessionManager:
+    """
+    Registry of open streaming sessions
+
+    Args:
+        max_sessions: Maximum number of open sessions
+        idle_timeout: Sessions without audio for this many seconds are ended
+        max_expired:  Expired session IDs remembered, so clients get an explicit "expired" error
+    """
+
+    def __init__(self, max_sessions: int = 8, idle_timeout: float = 120.0, max_expired: int = 256,
+                 **session_options):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_expired = max_expired
+        self.session_options = session_options
+        self._sessions: Dict[str, StreamingSession] = {}
+        self._expired: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, transcriber, sample_rate: int = SAMPLE_RATE) -> StreamingSession:
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                raise RuntimeError(f"Too many open streams ({self.max_sessions})")
+            session = StreamingSession(transcriber, sample_rate=sample_rate, **self.session_options)
+            self._sessions[session.session_id] = session
+            return session
+
+    def get(self, session_id: str) -> Optional[StreamingSession]:
+        with self._lock:
+            self._expire()
+            return self._sessions.get(session_id)
+
+    def is_expired(self, session_id: str) -> bool:
+        with self._lock:
+            self._expire()
+            return session_id in self._expired
+
+    def close(self, session_id: str) -> Optional[StreamingSession]:
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _expire(self):
+        now = time.time()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_activity > self.idle_timeout:
+                del self._sessions[session_id]
+                session.abort(f"Stream expired after {self.idle_timeout:g}s without audio")
+                self._expired[session_id] = now
+        while len(self._expired) > self.max_expired:
+            self._expired.popitem(last=False)
+
+
+# Shared by the streaming endpoints
+# STREAM_MAX_SESSIONS, STREAM_IDLE_TIMEOUT_S, STREAM_STEP_S (shortest step), STREAM_MAX_STEP_S,
+# STREAM_OVERLAP_S, STREAM_MAX_WINDOW_S, STREAM_MAX_BACKLOG_S
+stream_sessions = StreamingSessionManager(
+    max_sessions=int(os.getenv('STREAM_MAX_SESSIONS', '8')),
+    idle_timeout=float(os.getenv('STREAM_IDLE_TIMEOUT_S', '120')),
+    min_step_s=float(os.getenv('STREAM_STEP_S', '0.5')),
+    max_step_s=float(os.getenv('STREAM_MAX_STEP_S', '5.0')),
+    overlap_s=float(os.getenv('STREAM_OVERLAP_S', '1.5')),
+    max_window_s=float(os.getenv('STREAM_MAX_WINDOW_S', '30')),
+    max_backlog_s=float(os.getenv('STREAM_MAX_BACKLOG_S', '60'))
+)
@@ -4,6 +4,8 @@ WhisperX Transcription Module
 
 import os
 import time
+import zlib
+import threading
 from pathlib import Path
 from datetime import datetime
 from dataclasses import dataclass, asdict
@@ -12,6 +14,22 @@ import sys
 import json
 import argparse
 
+try:
+    from .align_model_cache import AlignModelCache, align_model_cache
+    from ..transcript_cache import TranscriptCache, transcript_cache
+    from ..audio import PipelineAudio, SAMPLE_RATE
+    from ..vad_prepass import remove_silence
+except ImportError:  # Run directly as a script
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from align_model_cache import AlignModelCache, align_model_cache
+    from transcript_cache import TranscriptCache, transcript_cache
+    from audio import PipelineAudio, SAMPLE_RATE
+    from vad_prepass import remove_silence
+
+# The VAD pre-pass changes every transcript (and so every transcript cache key), so it is opt-in
+VAD_PREPASS = os.getenv('TRANSCRIPTION_VAD_PREPASS', 'false').lower() in ('true', '1', 'yes')
+
+
 @dataclass
 class TranscriptionConfig:
     """Configuration for WhisperX transcription"""
@@ -23,7 +41,7 @@ class TranscriptionConfig:
     language: Optional[str] = "en"  # Defaulted to English
     initial_prompt: Optional[str] = None
     word_timestamps: bool = True
-    vad_filter: bool = False
+    vad_filter: bool = VAD_PREPASS  # Cut silence, ring-back and hold tones before decoding (vad_prepass)
     fp16: bool = False  # Always False for CPU
     condition_on_previous_text: bool = True
     compression_ratio_threshold: float = 2.4
@@ -31,19 +49,43 @@ class TranscriptionConfig:
     no_speech_threshold: float = 0.6
     align_model: Optional[str] = None
     batch_size: int = 16
+    compute_type: str = "int8"  # CTranslate2 compute type (int8 is fastest on CPU)
+    # Tiered mode: draft with a small model, re-decode low-confidence segments with model_size
+    tiered: bool = False
+    draft_model_size: str = "small"
+    refine_confidence_threshold: float = 0.6  # Mean word alignment score below which a segment is refined
 
     def to_dict(self):
         return asdict(self)
 
 
+def segment_confidence(segment: Dict) -> float:
+    """Mean alignment score of a segment's words (0.0 if it has no aligned words)."""
+    scores = [w["score"] for w in segment.get("words", []) if w.get("score") is not None]
+    return float(sum(scores) / len(scores)) if scores else 0.0
+
+
+def compression_ratio(text: str) -> float:
+    """gzip compression ratio of the text, as Whisper uses to detect repetitive output."""
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
 class WhisperXTranscriber:
     """WhisperX transcription wrapper - CPU only"""
 
-    def __init__(self, config: TranscriptionConfig = None):
+    def __init__(self, config: TranscriptionConfig = None, align_cache: AlignModelCache = None,
+                 cpu_threads: Optional[int] = None):
         self.config = config or TranscriptionConfig()
+        self.align_cache = align_cache or align_model_cache
+        self.cpu_threads = cpu_threads  # CTranslate2 threads (None: WhisperX default)
         self.model = None
+        self.draft_model = None  # Only loaded in tiered mode
         self.device = "cpu"  # Always CPU
         self.whisperx = None
+        # The underlying Whisper model is shared by all callers (e.g. the job queue workers),
+        # so decoding is serialized
+        self._lock = threading.Lock()
 
     def load_model(self):
         """Load WhisperX model on CPU."""
@@ -57,19 +99,139 @@ class WhisperXTranscriber:
 
         print(f"Loading WhisperX-{self.config.model_size} on CPU...")
 
-        self.model = whisperx.load_model(
-            self.config.model_size,
+        self.model = self._load_whisper(self.config.model_size)
+        if self.config.tiered:
+            print(f"Loading draft model WhisperX-{self.config.draft_model_size} on CPU...")
+            self.draft_model = self._load_whisper(self.config.draft_model_size)
+        print("Model loaded successfully!")
+
+    def _load_whisper(self, model_size: str):
+        options = {"threads": self.cpu_threads} if self.cpu_threads else {}
+        return self.whisperx.load_model(
+            model_size,
             "cpu",
-            compute_type="int8"  # Always int8 for CPU
+            compute_type=self.config.compute_type,
+            language=self.config.language,  # Presets the tokenizer so chunks can be decoded directly
+            **options
         )
-        print("Model loaded successfully!")
 
-    def transcribe(self, audio_file: str) -> Dict:
+    def preload_align_model(self, language: Optional[str] = None):
+        """Load the alignment model for a language into the shared cache ahead of time."""
+        if not self.config.word_timestamps:
+            return
+        if self.whisperx is None:
+            self.load_model()
+        self.align_cache.get(
+            self.whisperx,
+            language or self.config.language or "en",
+            self.device,
+            self.config.align_model
+        )
+
+    def load_audio(self, audio_file: str):
+        """Decode an audio file to 16 kHz mono float32 (memory-mapped if the pipeline already cached it)."""
+        return PipelineAudio.from_file(audio_file).samples
+
+    def recognize(self, audio) -> Dict:
+        """
+        Run speech recognition (VAD + Whisper) on decoded audio, without alignment.
+
+        Returns:
+            Dictionary with 'segments' (start, end, text) and 'language'
+        """
+        if self.model is None:
+            self.load_model()
+        with self._lock:
+            return self.model.transcribe(
+                audio,
+                batch_size=self.config.batch_size,
+                language=self.config.language
+            )
+
+    def vad_chunks(self, audio, chunk_size: int = 30) -> list:
+        """
+        Split decoded audio into the VAD chunks WhisperX would decode, as {'start', 'end'} in seconds.
+        Mirrors the pre-processing done inside FasterWhisperPipeline.transcribe.
+        """
+        if self.model is None:
+            self.load_model()
+        from whisperx.audio import SAMPLE_RATE
+        from whisperx.vads import Vad, Pyannote
+
+        pipeline = self.model
+        if issubclass(type(pipeline.vad_model), Vad):
+            waveform = pipeline.vad_model.preprocess_audio(audio)
+            merge_chunks = pipeline.vad_model.merge_chunks
+        else:
+            waveform = Pyannote.preprocess_audio(audio)
+            merge_chunks = Pyannote.merge_chunks
+
+        vad_segments = pipeline.vad_model({"waveform": waveform, "sample_rate": SAMPLE_RATE})
+        return merge_chunks(
+            vad_segments,
+            chunk_size,
+            onset=pipeline._vad_params["vad_onset"],
+            offset=pipeline._vad_params["vad_offset"],
+        )
+
+    def can_decode_chunks(self) -> bool:
+        """Chunks can only be decoded directly when the language (tokenizer) is fixed."""
+        return self.model is not None and getattr(self.model, "tokenizer", None) is not None
+
+    def decode_chunks(self, chunks: list, batch_size: Optional[int] = None) -> list:
+        """
+        Decode a list of audio chunks (float32 arrays, <= 30 s each) in batches.
+
+        Returns:
+            List of decoded texts, one per chunk
+        """
+        if self.model is None:
+            self.load_model()
+        batch_size = batch_size or self.config.batch_size
+
+        with self._lock:
+            outputs = self.model(
+                ({'inputs': chunk} for chunk in chunks),
+                batch_size=batch_size,
+                num_workers=0
+            )
+            texts = []
+            for out in outputs:
+                text = out['text']
+                if batch_size in [0, 1, None]:
+                    text = text[0]
+                texts.append(text)
+        return texts
+
+    def align(self, result: Dict, audio) -> Dict:
+        """Align recognized segments for word-level timestamps (keeps the detected language)."""
+        language = result["language"]
+        model_a, metadata = self.align_cache.get(
+            self.whisperx,
+            language,
+            self.device,
+            self.config.align_model
+        )
+        aligned = self.whisperx.align(
+            result["segments"],
+            model_a,
+            metadata,
+            audio,
+            self.device,
+            return_char_alignments=False
+        )
+        aligned["language"] = language
+        return aligned
+
+    def transcribe(self, audio_file: str, audio=None, recognize=None, decode_chunks=None) -> Dict:
         """
         Transcribe audio file
 
         Args:
-            audio_file: Path to audio file
+            audio_file:    Path to audio file
+            audio:         Optional already-decoded audio, array or PipelineAudio (skips decoding audio_file again)
+            recognize:     Optional replacement for self.recognize (e.g. a batching front-end)
+            decode_chunks: Optional replacement for self.decode_chunks, used by tiered refinement
 
         Returns:
             Dictionary with transcription results
@@ -81,48 +243,116 @@ class WhisperXTranscriber:
         start_time = time.time()
 
         # Load audio
-        audio = self.whisperx.load_audio(audio_file)
-
-        # Transcribe
-        result = self.model.transcribe(
-            audio,
-            batch_size=self.config.batch_size,
-            language=self.config.language
-        )
-
-        # Align for word-level timestamps
-        if self.config.word_timestamps:
-            model_a, metadata = self.whisperx.load_align_model(
-                language_code=result["language"],
-                device=self.device
-            )
-            result = self.whisperx.align(
-                result["segments"],
-                model_a,
-                metadata,
-                audio,
-                self.device,
-                return_char_alignments=False
-            )
+        if audio is None:
+            audio = self.load_audio(audio_file)
+        elif isinstance(audio, PipelineAudio):
+            audio = audio.samples
+
+        if self.config.tiered:
+            result = self._transcribe_tiered(audio, recognize or self.recognize,
+                                             decode_chunks or self.decode_chunks)
+        else:
+            # Transcribe (speech only), then map timestamps back to the full recording
+            result = self._recognize_speech(audio, recognize or self.recognize)
+
+            # Align for word-level timestamps
+            if self.config.word_timestamps:
+                result = self.align(result, audio)
 
         duration = time.time() - start_time
 
         # Format results to match test file structure
         return self._format_result(audio_file, result, duration)
 
+    def _recognize_speech(self, audio, recognize) -> Dict:
+        """
+        Run recognize on the speech regions of the audio only (when vad_filter is on).
+        Segment timestamps are returned on the original timeline, so alignment and later stages
+        keep using the full recording.
+        """
+        if not self.config.vad_filter:
+            return recognize(audio)
+
+        speech, timeline = remove_silence(audio)
+        print(f"VAD pre-pass: decoding {timeline.kept_seconds:.1f}s of {len(audio) / SAMPLE_RATE:.1f}s")
+        result = recognize(speech)
+        result["segments"] = timeline.map_segments(result["segments"])
+        return result
+
+    def _draft(self, audio) -> Dict:
+        with self._lock:
+            return self.draft_model.transcribe(
+                audio,
+                batch_size=self.config.batch_size,
+                language=self.config.language
+            )
+
+    def _transcribe_tiered(self, audio, recognize, decode_chunks) -> Dict:
+        """
+        Draft the whole call with the small model, then re-decode only low-confidence segments
+        with the full model. Segment confidence is the mean word alignment score, so the draft is
+        always aligned (words are dropped again if word_timestamps is off). A draft segment is kept
+        whenever its refinement comes back empty or alignment drops it.
+        """
+        draft = self.align(self._recognize_speech(audio, self._draft), audio)
+        segments = draft["segments"]
+
+        low = [i for i, seg in enumerate(segments)
+               if segment_confidence(seg) < self.config.refine_confidence_threshold]
+        print(f"Tiered transcription: refining {len(low)}/{len(segments)} draft segment(s) "
+              f"with {self.config.model_size}")
+
+        if low:
+            spans = [audio[int(segments[i]["start"] * SAMPLE_RATE):int(segments[i]["end"] * SAMPLE_RATE)]
+                     for i in low]
+            if self.can_decode_chunks():
+                # Every span is a single < 30 s chunk, so all of them go through the full model in one batched pass
+                texts = decode_chunks(spans)
+            else:
+                texts = [" ".join(seg["text"] for seg in recognize(span)["segments"]) for span in spans]
+
+            refined = [{"start": segments[i]["start"], "end": segments[i]["end"], "text": text}
+                       for i, text in zip(low, texts) if text.strip()]
+            aligned = []
+            if refined:
+                aligned = self.align({"segments": refined, "language": draft["language"]}, audio)["segments"]
+            aligned = [seg for seg in aligned if seg.get("text", "").strip()
+                       and seg.get("start") is not None and seg.get("end") is not None]
+
+            # Alignment can split a segment into sentences or drop it; match results back by midpoint
+            replacements = {i: [] for i in low}
+            for seg in aligned:
+                middle = (seg["start"] + seg["end"]) / 2
+                for i in low:
+                    if segments[i]["start"] <= middle <= segments[i]["end"]:
+                        replacements[i].append(seg)
+                        break
+
+            kept = sum(1 for i in low if not replacements[i])
+            if kept:
+                print(f"Tiered transcription: kept {kept} draft segment(s) the refinement lost")
+            segments = [seg for i, seg in enumerate(segments) if not replacements.get(i)] + \
+                       [seg for i in low for seg in replacements[i]]
+            segments.sort(key=lambda seg: seg["start"])
+
+        if not self.config.word_timestamps:
+            segments = [{k: v for k, v in seg.items() if k != "words"} for seg in segments]
+        return {"segments": segments, "language": draft["language"]}
+
     def _format_result(self, audio_file: str, result: Dict, duration: float) -> Dict:
         """Format transcription result to match test file structure exactly."""
         segments = []
         total_speech_duration = 0
 
         for seg in result.get("segments", []):
+            text = seg["text"].strip()
             segment_data = {
                 "start": seg["start"],
                 "end": seg["end"],
-                "text": seg["text"].strip(),
-                "confidence": 0.0,
-                "no_speech_prob": 0.0,
-                "compression_ratio": 0.0,
+                "text": text,
+                "confidence": round(segment_confidence(seg), 3),
+                "no_speech_prob": 0.0,  # Not reported by the batched WhisperX pipeline
+                "compression_ratio": round(compression_ratio(text), 3),
             }
 
             if "words" in seg:
@@ -131,6 +361,9 @@ class WhisperXTranscriber:
             segments.append(segment_data)
             total_speech_duration += (seg["end"] - seg["start"])
 
+        confidences = [s["confidence"] for s in segments]
+        ratios = [s["compression_ratio"] for s in segments]
+
         return {
             "audio_file": os.path.basename(audio_file),
             "implementation": "whisperx",
@@ -144,11 +377,11 @@ class WhisperXTranscriber:
             "segments": segments,
             "timestamp": datetime.now().isoformat(),
             "metrics": {
-                "avg_confidence": 0.0,
-                "min_confidence": 0.0,
-                "max_confidence": 0.0,
+                "avg_confidence": round(sum(confidences) / len(confidences), 3) if confidences else 0.0,
+                "min_confidence": min(confidences) if confidences else 0.0,
+                "max_confidence": max(confidences) if confidences else 0.0,
                 "avg_no_speech_prob": 0.0,
-                "avg_compression_ratio": 0.0,
+                "avg_compression_ratio": round(sum(ratios) / len(ratios), 3) if ratios else 0.0,
             }
         }
 
@@ -205,7 +438,7 @@ def find_wav_files(paths):
     return wav_files
 
 
-def transcribe_to_json(audio_files, output_dir=None, config=None):
+def transcribe_to_json(audio_files, output_dir=None, config=None, use_cache=True):
     """
     Transcribe audio files and save as JSON.
 
@@ -213,7 +446,9 @@ def transcribe_to_json(audio_files, output_dir=None, config=None):
         audio_files: List of audio file paths
         output_dir: Output directory (default: same as input file)
         config: TranscriptionConfig object
+        use_cache: Reuse transcriptions of identical audio from the transcript cache
     """
+    config = config or TranscriptionConfig()
     if not audio_files:
         print("No audio files found!")
         return
@@ -228,8 +463,20 @@ def transcribe_to_json(audio_files, output_dir=None, config=None):
         print(f"\n[{i}/{len(audio_files)}] Processing: {audio_file}")
 
         try:
-            # Transcribe
-            result = transcriber.transcribe(audio_file)
+            # Transcribe (or reuse the cached transcription of identical audio)
+            audio = transcriber.load_audio(audio_file)
+            cache_key = None
+            result = None
+            if use_cache:
+                cache_key = transcript_cache.make_key(TranscriptCache.audio_hash(audio), config, 'whisperx')
+                result = transcript_cache.get(cache_key)
+                if result is not None:
+                    result["audio_file"] = os.path.basename(audio_file)
+                    print("  Cache hit, skipping transcription")
+            if result is None:
+                result = transcriber.transcribe(audio_file, audio=audio)
+                if cache_key:
+                    transcript_cache.put(cache_key, result)
 
             original_stem = Path(audio_file).stem
             model_size = config.model_size.replace('-', '')  # Remove hyphens from model name
@@ -255,6 +502,10 @@ def transcribe_to_json(audio_files, output_dir=None, config=None):
         except Exception as e:
             print(f"[ERROR] Failed: {e}")
 
+    if use_cache:
+        stats = transcript_cache.stats()
+        print(f"\nTranscript cache: {stats['hits']} hit(s), {stats['misses']} miss(es)")
+
     print(f"\n{'=' * 80}")
     print(f"Completed! Processed {len(audio_files)} file(s)")
     print(f"{'=' * 80}")
@@ -280,6 +531,9 @@ Examples:
 
   # Use different model size
   python whisperx_transcriber.py audio.wav --model small
+
+  # Draft with small, refine low-confidence segments with large-v3
+  python whisperx_transcriber.py audio.wav --tiered
         """
     )
 
@@ -296,6 +550,17 @@ Examples:
                         help='Disable word-level timestamps')
     parser.add_argument('--batch-size', type=int, default=16,
                         help='Batch size for processing (default: 16)')
+    parser.add_argument('--vad-filter', action='store_true', default=VAD_PREPASS,
+                        help='Decode only the speech regions (cut silence and hold tones first)')
+    parser.add_argument('--tiered', action='store_true',
+                        help='Draft with a small model and re-decode only low-confidence segments with --model')
+    parser.add_argument('--draft-model', default='small',
+                        choices=['tiny', 'base', 'small', 'medium'],
+                        help='Draft model for --tiered (default: small)')
+    parser.add_argument('--refine-threshold', type=float, default=0.6,
+                        help='Confidence below which --tiered refines a segment (default: 0.6)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always transcribe, ignoring the transcript cache')
 
     args = parser.parse_args()
 
@@ -311,11 +576,15 @@ Examples:
         model_size=args.model,
         language=args.language,
         word_timestamps=not args.no_word_timestamps,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        vad_filter=args.vad_filter,
+        tiered=args.tiered,
+        draft_model_size=args.draft_model,
+        refine_confidence_threshold=args.refine_threshold
     )
 
     # Transcribe
-    transcribe_to_json(audio_files, args.output_dir, config)
+    transcribe_to_json(audio_files, args.output_dir, config, use_cache=not args.no_cache)
 
 
 if __name__ == "__main__":
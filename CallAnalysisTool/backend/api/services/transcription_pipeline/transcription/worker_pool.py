@@ -0,0 +1,215 @@
+"""
+Process-pool transcription engine
+
+Each worker process loads its own int8 WhisperX model once and is pinned to a fixed share of the
+CPU cores (CTranslate2, torch and OpenMP thread counts), so N calls are transcribed in parallel
+with predictable per-call latency instead of sharing one model in the Flask process.
+"""
+
+import os
+import queue
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    from .whisperx_transcriber import TranscriptionConfig, WhisperXTranscriber, PipelineAudio
+except ImportError:  # Run directly as a script
+    from whisperx_transcriber import TranscriptionConfig, WhisperXTranscriber, PipelineAudio
+
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+# Model instance owned by the current worker process
+_worker_transcriber = None
+
+# os.environ is process-wide, so worker processes are started one pool at a time
+_spawn_lock = threading.Lock()
+
+
+@contextmanager
+def _worker_environment(threads: int):
+    """
+    Thread limits for worker processes started inside the block.
+    A spawned worker re-imports the parent's main module (and with it numpy and torch) before its
+    initializer runs, so the limits have to be in the environment it is started with.
+    """
+    with _spawn_lock:
+        saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+        os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+        try:
+            yield
+        finally:
+            for var, value in saved.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+
+
+def _init_worker(config_dict: Dict, threads: int, ready):
+    """Process initializer: limit threads, load the model once, then report to the pool."""
+    global _worker_transcriber
+    try:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+            torch.set_num_interop_threads(1)
+        except (ImportError, RuntimeError):
+            pass
+
+        _worker_transcriber = WhisperXTranscriber(TranscriptionConfig(**config_dict), cpu_threads=threads)
+        _worker_transcriber.load_model()
+        _worker_transcriber.preload_align_model()
+    except Exception as e:
+        ready.put((os.getpid(), f"{type(e).__name__}: {e}"))
+        raise
+    ready.put((os.getpid(), None))
+    print(f"Transcription worker {os.getpid()} ready ({threads} threads)")
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _transcribe_in_worker(audio_file: str, audio) -> Dict:
+    if isinstance(audio, str):
+        # Path of the parent's decoded .npy; the parent owns (and deletes) it
+        audio = np.load(audio, mmap_mode='r')
+    return _worker_transcriber.transcribe(audio_file, audio=audio)
+
+
+def _recognize_in_worker(audio) -> Dict:
+    return _worker_transcriber.recognize(audio)
+
+
+class TranscriptionWorkerPool:
+    """
+    Dispatches transcriptions to idle worker processes
+
+    Args:
+        config:             TranscriptionConfig used by every worker
+        num_workers:        Worker processes (default: one per 8 cores)
+        threads_per_worker: CPU threads per worker (default: cores / num_workers)
+    """
+
+    def __init__(self, config: TranscriptionConfig = None, num_workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None):
+        self.config = config or TranscriptionConfig()
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or max(1, cpu_count // 8)
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        context = multiprocessing.get_context('spawn')  # torch and fork don't mix
+        self._ready = context.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.config.to_dict(), self.threads_per_worker, self._ready)
+        )
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def warmup(self):
+        """
+        Start every worker (loading its model) now instead of on the first calls.
+        Returns once each worker's initializer has reported its model loaded.
+        """
+        with self._start_lock:
+            if self._started:
+                return
+            # The executor starts one process per submission while none is idle
+            with _worker_environment(self.threads_per_worker):
+                futures = [self._executor.submit(_worker_pid) for _ in range(self.num_workers)]
+            started = 0
+            while started < self.num_workers:
+                try:
+                    pid, error = self._ready.get(timeout=1.0)
+                except queue.Empty:
+                    # A worker that died without reporting breaks the pool and fails its future
+                    broken = next((f for f in futures if f.done() and f.exception()), None)
+                    if broken is not None:
+                        raise RuntimeError("Transcription worker failed to start") from broken.exception()
+                    continue
+                if error:
+                    raise RuntimeError(f"Transcription worker {pid} failed to start: {error}")
+                started += 1
+            for future in futures:
+                future.result()
+            self._started = True
+        print(f"{self.num_workers} transcription worker(s) ready")
+
+    def load_audio(self, audio_file: str):
+        """Decode audio in the calling process (used for cache lookups)."""
+        return PipelineAudio.from_file(audio_file).samples
+
+    def _run(self, func, *args):
+        self.warmup()
+        with self._stats_lock:
+            self.submitted += 1
+        try:
+            result = self._executor.submit(func, *args).result()
+        except Exception:
+            with self._stats_lock:
+                self.failed += 1
+            raise
+        with self._stats_lock:
+            self.completed += 1
+        return result
+
+    def transcribe(self, audio_file: str, audio=None) -> Dict:
+        """
+        Transcribe on the next idle worker (blocks until done).
+
+        Args:
+            audio_file: Path to the audio file
+            audio:      Optional already-decoded audio. A PipelineAudio mapped from its .npy is passed
+                        by path and the worker maps the same file; other arrays are copied to the
+                        worker. Without it the worker decodes audio_file itself.
+        """
+        if isinstance(audio, PipelineAudio):
+            audio = str(audio.cache_file) if audio.cache_file is not None else audio.samples
+        elif audio is not None:
+            audio = np.asarray(audio)
+        return self._run(_transcribe_in_worker, str(audio_file), audio)
+
+    def recognize(self, audio) -> Dict:
+        """Recognition without alignment on the next idle worker (used by live streams)."""
+        return self._run(_recognize_in_worker, audio)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                'workers': self.num_workers,
+                'threads_per_worker': self.threads_per_worker,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'active': self.submitted - self.completed - self.failed,
+            }
+
+
+def create_worker_pool(config: TranscriptionConfig = None, num_workers: Optional[int] = None) -> TranscriptionWorkerPool:
+    """
+    Create a worker pool with the settings from the environment
+
+    num_workers: worker processes, normally the job queue's TRANSCRIPTION_WORKERS so every running
+                 pipeline has a process of its own (default: one per 8 cores)
+    TRANSCRIPTION_THREADS_PER_PROCESS: CPU threads per worker (default: cores / processes)
+    """
+    threads = os.getenv('TRANSCRIPTION_THREADS_PER_PROCESS')
+    return TranscriptionWorkerPool(
+        config,
+        num_workers=num_workers,
+        threads_per_worker=int(threads) if threads else None
+    )
@@ -0,0 +1,203 @@
+"""
+Energy-based VAD pre-pass
+
+Cuts dead air, ring-back and hold tones out of a call before Whisper decodes it, and maps the
+timestamps Whisper returns on the shortened audio back to the original call timeline.
+
+Frames are 30 ms. A frame is speech when its energy is well above the call's noise floor and its
+spectrum is not dominated by a few bins (steady tones such as ring-back and hold beeps are).
+Only silences longer than min_silence_s are cut, and every kept region is padded, so short
+pauses inside and around sentences are left untouched. Frame features are computed in fixed-size
+blocks, so memory use does not grow with the call length.
+
+Segments Whisper returns across a cut are split at it before their timestamps are mapped back, so
+alignment never spans audio that was removed.
+
+Usage:
+    speech, timeline = remove_silence(audio)
+    result = transcriber.recognize(speech)
+    result["segments"] = timeline.map_segments(result["segments"])
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# Frames analysed per block (~2 minutes of 30 ms frames, ~16 MB of spectrum)
+FEATURE_BLOCK_FRAMES = 4096
+
+
+class TimelineMap:
+    """
+    Maps times on the compacted (speech-only) audio back to the original audio
+
+    Args:
+        regions: Kept (start_sample, end_sample) regions of the original audio, in order
+    """
+
+    def __init__(self, regions: List[Tuple[int, int]], sample_rate: int = SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        bounds = np.asarray(regions, dtype=np.float64).reshape(-1, 2) / sample_rate
+        self.original_starts = bounds[:, 0]
+        lengths = bounds[:, 1] - bounds[:, 0]
+        self.compact_starts = np.concatenate([[0.0], np.cumsum(lengths)[:-1]])
+        self.compact_ends = self.compact_starts + lengths
+
+    @property
+    def kept_seconds(self) -> float:
+        return float(self.compact_ends[-1]) if len(self.compact_ends) else 0.0
+
+    def to_original(self, times, is_end: bool = False) -> np.ndarray:
+        """
+        Convert compact times to original times.
+        A time on a region boundary maps to the end of the earlier region for end times and to the
+        start of the later region for start times.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if is_end:
+            idx = np.searchsorted(self.compact_ends, times, side='left')
+        else:
+            idx = np.searchsorted(self.compact_starts, times, side='right') - 1
+        idx = np.clip(idx, 0, len(self.compact_starts) - 1)
+        return self.original_starts[idx] + (times - self.compact_starts[idx])
+
+    def split_at_cuts(self, segments: List[Dict]) -> List[Dict]:
+        """
+        Split unaligned segments (compact times, no words) that run across a cut into one segment
+        per kept region. The words are shared out in proportion to each piece's duration; pieces
+        left without words are dropped.
+        """
+        split = []
+        for seg in segments:
+            start, end = seg['start'], seg['end']
+            cuts = self.compact_ends[(self.compact_ends > start) & (self.compact_ends < end)]
+            words = seg.get('text', '').split()
+            if seg.get('words') or not len(cuts) or len(words) < 2 or end <= start:
+                split.append(seg)
+                continue
+            bounds = [start, *cuts.tolist(), end]
+            first = 0
+            for piece_start, piece_end in zip(bounds[:-1], bounds[1:]):
+                last = int(round(len(words) * (piece_end - start) / (end - start)))
+                if last > first:
+                    split.append(dict(seg, start=piece_start, end=piece_end, text=' ' + ' '.join(words[first:last])))
+                first = max(first, last)
+        return split
+
+    def map_segments(self, segments: List[Dict]) -> List[Dict]:
+        """Shift segment (and word) timestamps back onto the original timeline, splitting at cuts first."""
+        if not segments:
+            return segments
+        segments = self.split_at_cuts(segments)
+        starts = self.to_original([s['start'] for s in segments])
+        ends = self.to_original([s['end'] for s in segments], is_end=True)
+        mapped = []
+        for seg, start, end in zip(segments, starts, ends):
+            seg = dict(seg, start=round(float(start), 3), end=round(float(end), 3))
+            if seg.get('words'):
+                seg['words'] = [
+                    dict(w, start=round(float(self.to_original(w['start'])), 3),
+                         end=round(float(self.to_original(w['end'], is_end=True)), 3))
+                    if 'start' in w and 'end' in w else w
+                    for w in seg['words']
+                ]
+            mapped.append(seg)
+        return mapped
+
+
+def frame_features(audio: np.ndarray, frame: int, block_frames: int = FEATURE_BLOCK_FRAMES):
+    """
+    Per-frame energy (dB) and tonality (share of the energy in the 3 strongest FFT bins).
+    Frames are processed block_frames at a time, so only one block's spectrum is held in memory.
+    """
+    n_frames = len(audio) // frame
+    energy_db = np.empty(n_frames, dtype=np.float32)
+    tonality = np.empty(n_frames, dtype=np.float32)
+    window = np.hanning(frame).astype(np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(first + block_frames, n_frames)
+        frames = np.asarray(audio[first * frame:last * frame], dtype=np.float32).reshape(last - first, frame)
+        energy_db[first:last] = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        # Steady tones put almost all their energy into a couple of FFT bins
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+        top = np.partition(power, power.shape[1] - 3, axis=1)[:, -3:].sum(axis=1)
+        tonality[first:last] = top / (power.sum(axis=1) + 1e-10)
+    return energy_db, tonality
+
+
+def detect_speech_regions(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30,
+                          floor_margin_db: float = 12.0, min_silence_s: float = 0.8,
+                          pad_s: float = 0.3, tone_ratio: float = 0.7, min_tone_s: float = 0.5
+                          ) -> List[Tuple[int, int]]:
+    """
+    Find speech regions in mono float audio.
+
+    Args:
+        floor_margin_db: How far above the noise floor (10th percentile frame energy) speech must be
+        min_silence_s:   Only gaps at least this long are cut
+        pad_s:           Padding kept around every speech region
+        tone_ratio:      Frames with this share of their energy in the 3 strongest bins are tonal
+        min_tone_s:      Tonal frames only count as non-speech in runs at least this long (vowels are shorter)
+    Returns:
+        List of (start_sample, end_sample)
+    """
+    frame = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    energy_db, tonality = frame_features(audio, frame)
+
+    # Energy relative to the call's own noise floor
+    floor_db = np.percentile(energy_db, 10)
+    loud = energy_db > floor_db + floor_margin_db
+
+    tonal = _keep_runs(tonality > tone_ratio, int(np.ceil(min_tone_s * 1000 / frame_ms)))
+
+    speech = loud & ~tonal
+
+    # Pad speech, then close gaps shorter than min_silence_s
+    pad = int(np.ceil(pad_s * 1000 / frame_ms))
+    if pad:
+        speech = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode='same') > 0
+    speech = ~_keep_runs(~speech, int(np.ceil(min_silence_s * 1000 / frame_ms)))
+
+    # Run boundaries -> sample regions
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    regions = [(int(s * frame), int(e * frame)) for s, e in zip(starts, ends)]
+    if regions and ends[-1] == n_frames:
+        regions[-1] = (regions[-1][0], len(audio))  # Keep the partial last frame
+    return regions
+
+
+def _keep_runs(mask: np.ndarray, min_len: int) -> np.ndarray:
+    """Keep only True runs of at least min_len frames."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    out = np.zeros_like(mask, dtype=bool)
+    for s, e in zip(starts, ends):
+        if e - s >= min_len:
+            out[s:e] = True
+    return out
+
+
+def remove_silence(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, **options):
+    """
+    Cut non-speech regions out of the audio.
+
+    Returns:
+        Tuple of (speech-only audio, TimelineMap). If no speech is found the audio is returned
+        unchanged so the decoder still gets a chance.
+    """
+    regions = detect_speech_regions(audio, sample_rate, **options)
+    if not regions:
+        regions = [(0, len(audio))]
+    if len(regions) == 1 and regions[0] == (0, len(audio)):
+        return audio, TimelineMap(regions, sample_rate)
+    speech = np.concatenate([audio[start:end] for start, end in regions])
+    return speech, TimelineMap(regions, sample_rate)
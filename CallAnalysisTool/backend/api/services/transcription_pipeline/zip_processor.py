@@ -54,6 +54,33 @@ def find_cdr_file(extract_path):
     return cdr_files[0] if cdr_files else None
 
 
+def read_call_name(zip_path):
+    """
+    Read the folder name process_zip will use (YYYYMMDD_HHMMSS_agentname) from the CDR inside
+    the zip, without extracting anything.
+
+    Args:
+        zip_path (str or Path): Path to the zip file
+
+    Returns:
+        str: The folder name, or None if the zip or its CDR can't be read
+    """
+    try:
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            cdr_names = [name for name in zip_ref.namelist()
+                         if '/' not in name and name.endswith('-CDR.txt')]
+            if not cdr_names:
+                return None
+            cdr_content = zip_ref.read(cdr_names[0]).decode('utf-8', errors='ignore')
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+    date_str, time_str, agent_name = extract_info_from_cdr(cdr_content)
+    if not all([date_str, time_str, agent_name]):
+        return None
+    return f"{date_str}_{time_str}_{agent_name}"
+
+
 def process_zip(zip_path, output_dir=None):
     """
     Process a zip file: unzip, extract info from CDR, and rename files/folders.
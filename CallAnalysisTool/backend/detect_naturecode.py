@@ -2,30 +2,33 @@
 # Detects NatureCodes using keyword matching and text embeddings
 # CS4273 Group G 
 
-import pandas as pd
+import csv
 import json
 import re
+import hashlib
+import threading
+import time
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from dataclasses import dataclass, field
+from pathlib import Path
 from datetime import datetime
 import argparse
 import os
+from typing import Dict, List, Optional
 
-# Step 0: Load the EMS protocol questions
-df = pd.read_csv("data/EMSQA.csv")  # This has all our protocol questions
+import numpy as np
 
-# Step 1: Load NatureCode keywords
-with open("nature_keywords.json") as f:
-    NATURE_KEYWORDS = json.load(f)
+# Step 0: Paths are resolved from this file, so the detector works from any working directory
+BASE_DIR = Path(__file__).resolve().parent
+KEYWORDS_PATH = BASE_DIR / "nature_keywords.json"
+EMBEDDINGS_DIR = BASE_DIR / "cache" / "embeddings"
 
-# Step 2: Organize protocol questions by NatureCode 
-protocol_questions = defaultdict(list)
-for _, row in df.iterrows():
-    protocol_questions[row["NatureCode"]].append((row["Question_ID"], row["Question_Text"]))
-
-# Step 3: Load embedding model 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Step 1: Embedding model (loaded on first use, see NatureCodeDetector)
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# torch, onnx or onnx-int8 (see embedding_backend.py)
+EMBEDDING_BACKEND = os.getenv("NATURE_EMBEDDING_BACKEND", "torch")
+# Merge the encode calls of concurrent grading requests into shared batches
+EMBEDDING_MICRO_BATCHING = os.getenv("NATURE_EMBEDDING_MICRO_BATCHING", "true").lower() in ("true", "1", "yes")
 
 # Step 4: Detection setup 
 # Words that are super common and might trigger false positives
@@ -43,88 +46,427 @@ HIGH_PRIORITY_CODES = {
     "Cardiac or Respiratory Arrest / Death"
 }
 
-def run_detection(transcript_path, transcript_text, output_folder="keywordsOutput"):
-    # Split transcript into individual lines/segments
-    segment_texts = [line.strip() for line in transcript_text.split("\n") if line.strip()]
-    transcript_lower = transcript_text.lower()
-
-    # Prepare embeddings for similarity comparison
-    nature_names = list(NATURE_KEYWORDS.keys())
-    nature_texts = [" ".join(NATURE_KEYWORDS[n]) for n in nature_names]
-    nature_embeddings = model.encode(nature_texts, convert_to_numpy=True, normalize_embeddings=True)
-    segment_embeddings = model.encode(segment_texts, convert_to_numpy=True, normalize_embeddings=True)
-    transcript_embedding = model.encode(transcript_text, convert_to_numpy=True, normalize_embeddings=True)
-    sims_to_transcript = cosine_similarity([transcript_embedding], nature_embeddings)[0]
-
-    triggered_naturecodes = set()
-    match_details = {}
-    confidence_scores = {}
-
-    # Go through each NatureCode and see if it should be triggered
-    for i, nature in enumerate(nature_names):
-        keywords = NATURE_KEYWORDS[nature]
-        strong_hits = []
-
-        for seg in segment_texts:
-            seg_lower = seg.lower()
+@dataclass
+class DetectionResult:
+    """NatureCodes detected in one transcript"""
+    codes: List[str]                # Triggered NatureCodes, most confident first
+    hits: Dict[str, List[str]]      # Matched keywords of each triggered NatureCode
+    confidences: Dict[str, float]   # Confidence of every NatureCode
+    timings: Dict[str, float] = field(default_factory=dict)  # Seconds spent per step
+    log_path: Optional[str] = None  # Text log, if one was written
+
+    @property
+    def primary(self):
+        """Most confident NatureCode (None if nothing triggered)"""
+        return self.codes[0] if self.codes else None
+
+    def ranked(self):
+        """List of (NatureCode, confidence), most confident first"""
+        return [(n, self.confidences[n]) for n in self.codes]
+
+    def to_text(self):
+        """Same format as the keywordsOutput logs"""
+        lines = ["", "Filtered relevant NatureCodes (sorted by confidence):"]
+        for n in self.codes:
+            keywords_found = ", ".join(self.hits.get(n, [])) or "None"
+            lines.append(f"- {n}\n   Keywords: {keywords_found}\n   Confidence: {self.confidences[n]:.3f}")
+        return "\n".join(lines) + "\n"
+
+
+class KeywordMatcher:
+    """
+    All NatureCode keywords compiled into one word trie.
+    A transcript is scanned once, walking the trie from every word, so the cost grows with the
+    transcript length rather than with codes x keywords. A keyword matches exactly where
+    re.search(rf"\\b{re.escape(kw)}\\b", line) would: whole words, one space apart, on one line.
+    """
+
+    WORD = re.compile(r"\w+")
+    PLAIN_KEYWORD = re.compile(r"\w+(?: \w+)*")
+
+    def __init__(self, keywords_by_nature):
+        self.trie = {}
+        self.natures_by_keyword = defaultdict(set)
+        # Keywords with punctuation do not fit the word trie and keep their own pattern
+        self.patterns = {}
+        for nature, keywords in keywords_by_nature.items():
             for kw in keywords:
                 kw_low = kw.lower()
-                if re.search(rf"\b{re.escape(kw_low)}\b", seg_lower):
-                    if kw_low in COMMON_WORDS and nature != "Sick Person (Specific Diagnosis)":
-                        continue
-                    strong_hits.append(kw_low)
-
-        strong_hits = list(set(strong_hits))
-        sim_score = float(sims_to_transcript[i])
-        confidence = round(sim_score + 0.1 * len(strong_hits), 3)
-        confidence_scores[nature] = confidence
-
-        # Trigger rules
-        if nature == "Case Entry":
-            # Always include Case Entry
-            case_keywords = ["emergency", "address", "phone", "patient", "confirmed", "verified"]
-            case_hits = [kw for kw in case_keywords if kw in transcript_lower]
-            triggered_naturecodes.add("Case Entry")
-            match_details["Case Entry"] = case_hits or ["None"]
-            confidence_scores["Case Entry"] = confidence_scores.get("Case Entry", 0.3)
-        else:
-            # High-priority codes only need one keyword, others need 2+
-            if (nature in HIGH_PRIORITY_CODES and len(strong_hits) >= 1) or len(strong_hits) >= 2:
-                triggered_naturecodes.add(nature)
-                match_details[nature] = strong_hits
+                self.natures_by_keyword[kw_low].add(nature)
+                if self.PLAIN_KEYWORD.fullmatch(kw_low):
+                    node = self.trie
+                    for word in kw_low.split(" "):
+                        node = node.setdefault(word, {})
+                    node[None] = kw_low  # None marks the end of a keyword
+                else:
+                    self.patterns[kw_low] = re.compile(rf"\b{re.escape(kw_low)}\b")
+
+    def find_keywords(self, text):
+        """Set of (lowercase) keywords that occur in the text"""
+        found = set()
+        for line in text.lower().split("\n"):
+            words = list(self.WORD.finditer(line))
+            for i in range(len(words)):
+                node = self.trie
+                for j in range(i, len(words)):
+                    node = node.get(words[j].group())
+                    if node is None:
+                        break
+                    if None in node:
+                        found.add(node[None])
+                    # Multi-word keywords continue only across a single space
+                    if j + 1 < len(words) and line[words[j].end():words[j + 1].start()] != " ":
+                        break
+            for kw, pattern in self.patterns.items():
+                if pattern.search(line):
+                    found.add(kw)
+        return found
+
+    def hits_by_nature(self, text):
+        """NatureCode -> set of its keywords found in the text"""
+        hits = defaultdict(set)
+        for kw in self.find_keywords(text):
+            for nature in self.natures_by_keyword[kw]:
+                hits[nature].add(kw)
+        return hits
+
+
+class NatureCodeDetector:
+    """
+    Detects NatureCodes in transcripts.
+    The keyword file and the embedding model are loaded on first use (or by warmup()),
+    not at import, and loading is thread-safe.
+    The NatureCode embedding matrix is encoded once per keyword file, model and backend, saved under
+    embeddings_dir and memory-mapped on later runs.
+    """
+
+    def __init__(self, keywords_path=KEYWORDS_PATH, model_name=EMBEDDING_MODEL, embeddings_dir=EMBEDDINGS_DIR,
+                 backend=EMBEDDING_BACKEND, micro_batching=EMBEDDING_MICRO_BATCHING):
+        self.keywords_path = Path(keywords_path)
+        self.model_name = model_name
+        self.embeddings_dir = Path(embeddings_dir)
+        self.backend_name = backend
+        self.micro_batching = micro_batching
+        self._keywords = None
+        self._backend = None
+        self._nature_embeddings = None
+        self._matcher = None
+        self._lock = threading.RLock()
+
+    @property
+    def keywords(self):
+        """NatureCode -> keyword list from nature_keywords.json"""
+        if self._keywords is None:
+            with self._lock:
+                if self._keywords is None:
+                    with open(self.keywords_path, encoding="utf-8") as f:
+                        self._keywords = json.load(f)
+        return self._keywords
+
+    @property
+    def backend(self):
+        """Embedding backend (torch, onnx or onnx-int8, see embedding_backend.py)"""
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    # Imported here because the backends pull in torch or onnxruntime
+                    from embedding_backend import create_batching_embedder, load_backend
+                    backend = load_backend(self.backend_name, self.model_name)
+                    if self.micro_batching:
+                        backend = create_batching_embedder(backend)
+                    self._backend = backend
+        return self._backend
+
+    @property
+    def matcher(self):
+        """KeywordMatcher over all NatureCode keywords"""
+        if self._matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    self._matcher = KeywordMatcher(self.keywords)
+        return self._matcher
+
+    def embeddings_path(self):
+        """Embedding matrix file for the current keyword file contents, model and backend"""
+        digest = hashlib.sha256()
+        with open(self.keywords_path, "rb") as f:
+            digest.update(f.read())
+        digest.update(self.model_name.encode("utf-8"))
+        # Backends agree closely but not exactly, so the matrix must come from the one encoding transcripts
+        digest.update(self.backend_name.encode("utf-8"))
+        return self.embeddings_dir / f"nature_{digest.hexdigest()[:16]}.npy"
+
+    @property
+    def nature_embeddings(self):
+        """(NatureCodes x dim) normalized embeddings, rows in nature_keywords.json order"""
+        if self._nature_embeddings is None:
+            with self._lock:
+                if self._nature_embeddings is None:
+                    path = self.embeddings_path()
+                    if not path.exists():
+                        keywords = self.keywords
+                        nature_texts = [" ".join(keywords[n]) for n in keywords]
+                        matrix = self.embed(nature_texts)
+                        # Write to a temp file first so another process never maps a half-written matrix
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                        with open(tmp_path, "wb") as f:
+                            np.save(f, matrix.astype(np.float32))
+                        os.replace(tmp_path, path)
+                    self._nature_embeddings = np.load(path, mmap_mode="r")
+        return self._nature_embeddings
+
+    def warmup(self):
+        """Load the keywords, the embedding backend and the NatureCode embeddings now instead of on the first transcript."""
+        self.keywords
+        self.matcher
+        self.backend
+        self.nature_embeddings
+
+    def embed(self, texts, batch_size=32):
+        """(texts x dim) normalized embeddings of a list of texts"""
+        return self.backend.encode(texts, batch_size=batch_size)
+
+    def classify(self, transcript_text, sims_to_transcript):
+        """
+        Apply the keyword and trigger rules to one transcript.
+
+        Args:
+            transcript_text:    Transcript as plain text
+            sims_to_transcript: Cosine similarity of the transcript to every NatureCode (nature_keywords.json order)
+        Returns:
+            DetectionResult (without timings)
+        """
+        transcript_lower = transcript_text.lower()
+        nature_names = list(self.keywords.keys())
+
+        # One pass over the transcript finds the keyword hits of every NatureCode
+        hits_by_nature = self.matcher.hits_by_nature(transcript_text)
+
+        triggered_naturecodes = set()
+        match_details = {}
+        confidence_scores = {}
+
+        # Go through each NatureCode and see if it should be triggered
+        for i, nature in enumerate(nature_names):
+            strong_hits = sorted(
+                kw for kw in hits_by_nature.get(nature, ())
+                if not (kw in COMMON_WORDS and nature != "Sick Person (Specific Diagnosis)")
+            )
+            sim_score = float(sims_to_transcript[i])
+            confidence = round(sim_score + 0.1 * len(strong_hits), 3)
+            confidence_scores[nature] = confidence
+
+            # Trigger rules
+            if nature == "Case Entry":
+                # Always include Case Entry
+                case_keywords = ["emergency", "address", "phone", "patient", "confirmed", "verified"]
+                case_hits = [kw for kw in case_keywords if kw in transcript_lower]
+                triggered_naturecodes.add("Case Entry")
+                match_details["Case Entry"] = case_hits or ["None"]
+                confidence_scores["Case Entry"] = confidence_scores.get("Case Entry", 0.3)
+            else:
+                # High-priority codes only need one keyword, others need 2+
+                if (nature in HIGH_PRIORITY_CODES and len(strong_hits) >= 1) or len(strong_hits) >= 2:
+                    triggered_naturecodes.add(nature)
+                    match_details[nature] = strong_hits
+
+        # Remove "Unknown Problem" if other stronger codes exist
+        if "Unknown Problem (Person Down)" in triggered_naturecodes and any(
+            n for n in triggered_naturecodes if n not in ["Case Entry", "Unknown Problem (Person Down)"]
+        ):
+            triggered_naturecodes.remove("Unknown Problem (Person Down)")
+
+        # Sort by confidence
+        triggered_naturecodes = sorted(triggered_naturecodes, key=lambda n: confidence_scores.get(n, 0), reverse=True)
+
+        return DetectionResult(
+            codes=triggered_naturecodes,
+            hits={n: match_details.get(n, []) for n in triggered_naturecodes},
+            confidences=confidence_scores,
+        )
 
-    # Remove "Unknown Problem" if other stronger codes exist
-    if "Unknown Problem (Person Down)" in triggered_naturecodes and any(
-        n for n in triggered_naturecodes if n not in ["Case Entry", "Unknown Problem (Person Down)"]
-    ):
-        triggered_naturecodes.remove("Unknown Problem (Person Down)")
+    def run(self, transcript_path, transcript_text, output_folder=None):
+        """
+        Detect the NatureCodes of one transcript.
 
-    # Sort by confidence
-    triggered_naturecodes = sorted(triggered_naturecodes, key=lambda n: confidence_scores.get(n, 0), reverse=True)
+        Args:
+            transcript_path: Name of the transcript, only used to name the log file
+            transcript_text: Transcript as plain text (one segment per line)
+            output_folder:   If set, the result is also written to <name>_naturecodes.txt in this folder
+        Returns:
+            DetectionResult
+        """
+        start = time.perf_counter()
 
-    # Step 5: Save output 
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        transcript_embedding = self.embed([transcript_text])[0]
+        sims_to_transcript = self.nature_embeddings @ transcript_embedding
+        embedded = time.perf_counter()
+
+        result = self.classify(transcript_text, sims_to_transcript)
+        result.timings = {
+            "embedding": round(embedded - start, 4),
+            "keywords": round(time.perf_counter() - embedded, 4),
+            "total": round(time.perf_counter() - start, 4),
+        }
+
+        # Step 5: Save output (optional)
+        if output_folder:
+            result.log_path = write_log(result, transcript_path, output_folder)
+            print(f"Finished processing {transcript_path}, results saved to {result.log_path}")
+
+        return result
+
+    def run_batch(self, transcript_texts, batch_size=64):
+        """
+        Detect the NatureCodes of many transcripts with one embedding pass.
+        All transcripts are encoded in batches of batch_size and scored against every NatureCode with
+        a single matrix multiply. The embedding time in each result's timings is its share of the batch.
+
+        Returns:
+            List of DetectionResult, in input order
+        """
+        if not transcript_texts:
+            return []
+        start = time.perf_counter()
+        sims = self.embed(list(transcript_texts), batch_size=batch_size) @ self.nature_embeddings.T
+        embedding_share = (time.perf_counter() - start) / len(transcript_texts)
+
+        results = []
+        for text, row in zip(transcript_texts, sims):
+            matched = time.perf_counter()
+            result = self.classify(text, row)
+            keyword_time = time.perf_counter() - matched
+            result.timings = {
+                "embedding": round(embedding_share, 4),
+                "keywords": round(keyword_time, 4),
+                "total": round(embedding_share + keyword_time, 4),
+            }
+            results.append(result)
+        return results
+
+
+def write_log(result, transcript_path, output_folder="keywordsOutput"):
+    """Write a DetectionResult to <output_folder>/<transcript name>_naturecodes.txt and return the path."""
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
     transcript_name = os.path.basename(transcript_path).replace(".json", "")
     log_filename = os.path.join(output_folder, f"{transcript_name}_naturecodes.txt")
-
     with open(log_filename, "w") as log_file:
-        log_file.write("\nFiltered relevant NatureCodes (sorted by confidence):\n")
-        for n in triggered_naturecodes:
-            keywords_found = ", ".join(match_details.get(n, [])) or "None"
-            conf = confidence_scores[n]
-            log_file.write(f"- {n}\n   Keywords: {keywords_found}\n   Confidence: {conf:.3f}\n")
+        log_file.write(result.to_text())
+    return log_filename
 
-    print(f"Finished processing {transcript_path}, results saved to {log_filename}")
 
-    return log_filename
+# Shared detector, created on first use
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector():
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = NatureCodeDetector()
+    return _detector
+
+
+def detector_stats():
+    """Embedding backend and micro-batching counters of the shared detector (without loading it)"""
+    detector = _detector
+    backend = detector._backend if detector is not None else None
+    return {
+        "backend": detector.backend_name if detector is not None else EMBEDDING_BACKEND,
+        "loaded": backend is not None,
+        "micro_batching": backend.stats() if hasattr(backend, "stats") else None,
+    }
+
+
+def warmup_detector():
+    """Preload the shared detector (called once at Flask startup)."""
+    get_detector().warmup()
+
+
+def run_detection(transcript_path, transcript_text, output_folder=None):
+    """Detect NatureCodes with the shared detector (see NatureCodeDetector.run)."""
+    return get_detector().run(transcript_path, transcript_text, output_folder)
+
+
+def load_transcript_text(path):
+    """Plain text of a transcript file (.json transcripts are converted like in AIGrader)"""
+    if str(path).lower().endswith(".json"):
+        from JSONTranscriptionParser import json_to_text
+        return json_to_text(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def collect_transcripts(inputs):
+    """Expand files and directories (their .json and .txt files, sorted) into a list of transcript paths"""
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            paths.extend(sorted(p for p in item.iterdir() if p.suffix.lower() in (".json", ".txt")))
+        else:
+            paths.append(item)
+    return [str(p) for p in paths]
+
+
+def write_results_csv(results, csv_path):
+    """One row per triggered NatureCode of every transcript"""
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["transcript", "rank", "nature_code", "confidence", "keywords"])
+        for path, result in results.items():
+            for rank, (nature, confidence) in enumerate(result.ranked(), start=1):
+                writer.writerow([path, rank, nature, f"{confidence:.3f}", ", ".join(result.hits.get(nature, []))])
+
+
+def run_batch_detection(inputs, csv_path=None, batch_size=64):
+    """
+    Detect the NatureCodes of many transcripts in one embedding pass (e.g. re-scoring the archive).
+
+    Args:
+        inputs:     Transcript files and/or directories of .json/.txt transcripts
+        csv_path:   If set, all results are written to this CSV
+        batch_size: SentenceTransformer encode batch size
+    Returns:
+        Dict of transcript path -> DetectionResult (transcripts that could not be read are skipped)
+    """
+    paths, texts = [], []
+    for path in collect_transcripts(inputs):
+        text = load_transcript_text(path)
+        if not text:
+            print(f"Skipping {path}: could not read transcript")
+            continue
+        paths.append(path)
+        texts.append(text)
+
+    results = dict(zip(paths, get_detector().run_batch(texts, batch_size=batch_size)))
+    if csv_path:
+        write_results_csv(results, csv_path)
+    return results
 
 
 # Step 6: main, output
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Detect NatureCodes in a transcript")
-    parser.add_argument("transcript", help="Path to transcript file (.txt)")
+    parser = argparse.ArgumentParser(description="Detect NatureCodes in transcripts")
+    parser.add_argument("transcripts", nargs="+", help="Transcript file(s) (.txt or .json); with --batch also directories")
     parser.add_argument("--output", default="keywordsOutput", help="Folder to save outputs")
+    parser.add_argument("--batch", action="store_true",
+                        help="Score all transcripts in one embedding pass and write a single CSV")
+    parser.add_argument("--csv", default="naturecodes.csv", help="Results table for --batch")
+    parser.add_argument("--batch-size", type=int, default=64, help="Encode batch size for --batch")
     args = parser.parse_args()
 
-    run_detection(args.transcript, args.output)
+    if args.batch:
+        start = time.perf_counter()
+        results = run_batch_detection(args.transcripts, args.csv, args.batch_size)
+        print(f"Scored {len(results)} transcripts in {time.perf_counter() - start:.1f}s, results saved to {args.csv}")
+    else:
+        for transcript_path in args.transcripts:
+            result = run_detection(transcript_path, load_transcript_text(transcript_path), args.output)
+            print(result.to_text())
+            print(f"Timings (s): {result.timings}")
@@ -0,0 +1,310 @@
+"""
+Embedding backends for nature code detection
+
+The same sentence embedding model (all-MiniLM-L6-v2) can run through
+    torch       SentenceTransformer on PyTorch (default)
+    onnx        ONNX Runtime, fp32 export of the model
+    onnx-int8   ONNX Runtime, dynamically quantized int8 weights
+
+All three go through SentenceTransformer; the ONNX ones use its ONNX Runtime backend
+(pip install -r requirements-onnx.txt). ONNX models are exported once to cache/onnx/<model>/ and
+reused from then on. Select the backend with NATURE_EMBEDDING_BACKEND and the int8 kernel set with
+NATURE_ONNX_QUANTIZATION (arm64, avx2, avx512 or avx512_vnni).
+
+BatchingEmbedder wraps any backend so that encode calls from concurrent requests are merged into
+shared batches (NATURE_EMBEDDING_MICRO_BATCHING).
+
+Usage:
+    backend = load_backend("onnx-int8")
+    vectors = backend.encode(["chest pain", "not breathing"])   # (2 x 384), L2-normalized
+
+    # Parity against the PyTorch embeddings and a latency benchmark of every backend
+    python embedding_backend.py --compare tests/test_transcript.json
+"""
+
+import os
+import argparse
+import math
+import queue
+import shutil
+import statistics
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+ONNX_CACHE_DIR = BASE_DIR / "cache" / "onnx"
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Instruction set the int8 model is quantized for (see export_dynamic_quantized_onnx_model)
+ONNX_QUANTIZATION = os.getenv("NATURE_ONNX_QUANTIZATION", "avx2")
+
+
+class SentenceTransformerBackend:
+    """
+    SentenceTransformer with one of its inference backends
+
+    Args:
+        name:         Backend name reported to callers (torch, onnx or onnx-int8)
+        model_path:   Model name or local directory
+        model_kwargs: Extra SentenceTransformer options (backend, model_kwargs)
+    """
+
+    def __init__(self, name, model_path, **model_kwargs):
+        # Imported here because it pulls in torch
+        from sentence_transformers import SentenceTransformer
+        self.name = name
+        self.model = SentenceTransformer(str(model_path), device="cpu", **model_kwargs)
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True)
+
+
+def export_onnx(model_name, quantized=False, cache_dir=ONNX_CACHE_DIR, quantization=ONNX_QUANTIZATION):
+    """
+    Export the model with sentence-transformers' ONNX backend (once) and return the local model
+    directory and the ONNX file to load from it.
+    The int8 variant is made with export_dynamic_quantized_onnx_model from the fp32 export.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    model_dir = Path(cache_dir) / model_name.replace("/", "__")
+    if not (model_dir / "onnx" / "model.onnx").exists():
+        print(f"Exporting {model_name} to ONNX in {model_dir}...")
+        # Save to a temp directory first so another process never loads a half-written model
+        tmp_dir = model_dir.with_name(f"{model_dir.name}.{os.getpid()}.tmp")
+        model_dir.parent.mkdir(parents=True, exist_ok=True)
+        SentenceTransformer(model_name, device="cpu", backend="onnx").save(str(tmp_dir))
+        try:
+            os.replace(tmp_dir, model_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Another process finished first
+    if not quantized:
+        return model_dir, "onnx/model.onnx"
+
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+    if not (model_dir / file_name).exists():
+        print(f"Quantizing {model_name} to int8 ({quantization})...")
+        export_dynamic_quantized_onnx_model(
+            SentenceTransformer(str(model_dir), device="cpu", backend="onnx"),
+            quantization_config=quantization,
+            model_name_or_path=str(model_dir),
+        )
+    return model_dir, file_name
+
+
+def load_backend(name, model_name="all-MiniLM-L6-v2"):
+    """Create an embedding backend by name (torch, onnx or onnx-int8)."""
+    if name == "torch":
+        return SentenceTransformerBackend("torch", model_name)
+    if name in ("onnx", "onnx-int8"):
+        try:
+            model_dir, file_name = export_onnx(model_name, quantized=(name == "onnx-int8"))
+            return SentenceTransformerBackend(name, model_dir, backend="onnx",
+                                              model_kwargs={"file_name": file_name})
+        except ImportError as e:
+            raise ImportError(
+                f"{e}. The ONNX backends need the ONNX extra (pip install -r requirements-onnx.txt)"
+            ) from e
+    raise ValueError(f"Unknown embedding backend '{name}', expected one of: {', '.join(BACKENDS)}")
+
+
+class _PendingEncode:
+    """Texts of one caller waiting to be encoded"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchingEmbedder:
+    """
+    Drop-in replacement for an embedding backend that batches encode calls across threads
+
+    Every grading request encodes a single transcript. Requests that arrive within a short window
+    are encoded together in one backend call and each caller gets back its own rows.
+
+    Args:
+        backend:         Loaded embedding backend
+        max_wait_ms:     How long the first pending call waits for others to join its batch
+        max_batch_texts: Stop collecting once this many texts are pending; larger calls
+                         (e.g. batch detection) skip the queue
+        batch_size:      Backend batch size for the merged call
+    """
+
+    def __init__(self, backend, max_wait_ms=10, max_batch_texts=64, batch_size=64):
+        self.backend = backend
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_texts = max_batch_texts
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self.model_passes = 0
+        self.direct_requests = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    @property
+    def name(self):
+        return self.backend.name
+
+    def encode(self, texts, batch_size=32):
+        """Batched equivalent of the backend's encode"""
+        texts = list(texts)
+        if not texts:
+            return self.backend.encode(texts, batch_size)
+        if len(texts) >= self.max_batch_texts:
+            with self._stats_lock:
+                self.direct_requests += 1
+            return self.backend.encode(texts, batch_size)
+
+        pending = _PendingEncode(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.vectors
+
+    def _collect(self):
+        """Block for the first pending call, then gather more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        total = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch_texts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            total += len(pending.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                all_texts = [text for pending in batch for text in pending.texts]
+                vectors = self.backend.encode(all_texts, self.batch_size)
+
+                # Split the rows back to each caller
+                offset = 0
+                for pending in batch:
+                    pending.vectors = vectors[offset:offset + len(pending.texts)]
+                    offset += len(pending.texts)
+
+                with self._stats_lock:
+                    self.batches += 1
+                    self.requests += len(batch)
+                    self.texts += len(all_texts)
+                    self.model_passes += math.ceil(len(all_texts) / self.batch_size)
+            except Exception as e:
+                print(f"Batched embedding failed: {e}")
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+    def stats(self):
+        """Batch counters; fill_rate is the average share of batch_size slots used per backend pass"""
+        with self._stats_lock:
+            slots = self.model_passes * self.batch_size
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "direct_requests": self.direct_requests,
+                "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "avg_texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "model_passes": self.model_passes,
+                "fill_rate": round(self.texts / slots, 3) if slots else 0.0,
+                "window_ms": round(self.max_wait * 1000),
+                "max_batch_texts": self.max_batch_texts,
+            }
+
+
+def create_batching_embedder(backend):
+    """
+    Wrap a backend with the settings from the environment
+
+    NATURE_EMBEDDING_BATCH_WINDOW_MS: how long to wait for other requests to join a batch (default: 10)
+    NATURE_EMBEDDING_BATCH_MAX_TEXTS: texts per collected batch (default: 64)
+    """
+    max_texts = int(os.getenv("NATURE_EMBEDDING_BATCH_MAX_TEXTS", "64"))
+    return BatchingEmbedder(
+        backend,
+        max_wait_ms=float(os.getenv("NATURE_EMBEDDING_BATCH_WINDOW_MS", "10")),
+        max_batch_texts=max_texts,
+        batch_size=max_texts
+    )
+
+
+def check_parity(backend, reference, texts, batch_size=32):
+    """
+    Cosine similarity between a backend's embeddings and the reference (PyTorch) embeddings.
+
+    Returns:
+        Dict with the minimum and mean cosine similarity over the texts
+    """
+    cosine = np.sum(backend.encode(texts, batch_size) * reference.encode(texts, batch_size), axis=1)
+    return {"min_cosine": round(float(cosine.min()), 5), "mean_cosine": round(float(cosine.mean()), 5)}
+
+
+def benchmark(backend, texts, repeats=20):
+    """Latency of encoding one text at a time (the per-transcript detection path), in milliseconds."""
+    backend.encode(texts[:1])  # Warm-up
+    times = []
+    for _ in range(repeats):
+        for text in texts:
+            start = time.perf_counter()
+            backend.encode([text])
+            times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "p50_ms": round(statistics.median(times), 2),
+        "p95_ms": round(times[int(0.95 * (len(times) - 1))], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare nature code embedding backends")
+    parser.add_argument("transcripts", nargs="*", help="Transcripts (.json or .txt) to embed; "
+                                                       "default: the NatureCode keyword texts")
+    parser.add_argument("--compare", action="store_true", help="Parity check and benchmark of every backend")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    from detect_naturecode import KEYWORDS_PATH, load_transcript_text
+    if args.transcripts:
+        texts = [load_transcript_text(path) for path in args.transcripts]
+    else:
+        import json
+        with open(KEYWORDS_PATH, encoding="utf-8") as f:
+            texts = [" ".join(keywords) for keywords in json.load(f).values()]
+
+    reference = load_backend("torch", args.model)
+    print(f"{'backend':<10} {'min cos':>8} {'mean cos':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in args.backends:
+        backend = reference if name == "torch" else load_backend(name, args.model)
+        parity = check_parity(backend, reference, texts)
+        latency = benchmark(backend, texts, args.repeats) if args.compare else {"p50_ms": "-", "p95_ms": "-"}
+        print(f"{name:<10} {parity['min_cosine']:>8} {parity['mean_cosine']:>9} "
+              f"{latency['p50_ms']:>8} {latency['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
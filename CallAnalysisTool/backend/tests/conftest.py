@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import backend modules (api.*, detect_naturecode, ...) the way app.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
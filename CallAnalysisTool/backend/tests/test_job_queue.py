@@ -0,0 +1,184 @@
+"""JobQueue: bounded admission, state transitions and atomic completion."""
+
+import io
+import threading
+import time
+
+import pytest
+
+from api.services.job_queue import JobQueue, QueueFullError
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the job queue")
+        time.sleep(0.005)
+
+
+def blocking_job(started, release, result='done'):
+    def run(progress):
+        started.set()
+        release.wait(5)
+        return result
+    return run
+
+
+def test_full_queue_rejects_new_jobs():
+    queue = JobQueue(max_workers=1, max_pending=2)
+    release = threading.Event()
+    jobs = [queue.submit(blocking_job(threading.Event(), release)) for _ in range(2)]
+
+    with pytest.raises(QueueFullError):
+        queue.submit(blocking_job(threading.Event(), release))
+    assert len(queue.list()) == 2
+
+    release.set()
+    wait_until(lambda: all(job.done for job in jobs))
+    # Finished jobs no longer count against max_pending
+    queue.submit(blocking_job(threading.Event(), release))
+
+
+def test_job_runs_through_queued_running_completed():
+    queue = JobQueue(max_workers=1)
+    blocker_started, release_blocker = threading.Event(), threading.Event()
+    queue.submit(blocking_job(blocker_started, release_blocker))
+    blocker_started.wait(5)
+
+    started, release = threading.Event(), threading.Event()
+    job = queue.submit(blocking_job(started, release, result={'foldername': 'call'}), stages=('transcribe',))
+    status = job.to_dict()
+    assert status['state'] == 'queued'
+    assert status['started_at'] is None
+
+    release_blocker.set()
+    assert started.wait(5)
+    status = job.to_dict()
+    assert status['state'] == 'running'
+    assert status['started_at'] is not None
+    assert status['result'] is None and status['finished_at'] is None
+
+    release.set()
+    wait_until(lambda: job.done)
+    status = job.to_dict()
+    assert status['state'] == 'completed'
+    assert status['result'] == {'foldername': 'call'}
+    assert status['finished_at'] is not None
+    assert status['error'] is None
+
+
+def test_failed_job_records_error_and_failed_stage():
+    queue = JobQueue(max_workers=1)
+
+    def fail(progress):
+        progress('transcribe', 'running')
+        raise ValueError("Could not process zip file")
+
+    job = queue.submit(fail, stages=('extract', 'transcribe'))
+    wait_until(lambda: job.done)
+    status = job.to_dict()
+    assert status['state'] == 'failed'
+    assert status['error'] == "Could not process zip file"
+    assert status['result'] is None
+    assert status['finished_at'] is not None
+    assert status['stages']['transcribe']['status'] == 'failed'
+    assert status['stages']['extract']['status'] == 'pending'
+
+
+def test_pollers_never_see_a_finished_job_without_its_result():
+    queue = JobQueue(max_workers=4, max_pending=500)
+    jobs = [queue.submit(lambda progress, i=i: {'index': i}) for i in range(300)]
+    violations = []
+
+    def poll():
+        while not all(job.done for job in jobs):
+            for job in jobs:
+                status = job.to_dict()
+                finished = status['state'] in ('completed', 'failed')
+                if finished != (status['finished_at'] is not None):
+                    violations.append(status)
+                if (status['state'] == 'completed') != (status['result'] is not None):
+                    violations.append(status)
+
+    pollers = [threading.Thread(target=poll) for _ in range(3)]
+    for poller in pollers:
+        poller.start()
+    for poller in pollers:
+        poller.join(10)
+
+    assert not violations
+    assert [job.result for job in jobs] == [{'index': i} for i in range(300)]
+
+
+def test_transcribe_route_returns_503_when_queue_is_full(monkeypatch, tmp_path):
+    flask = pytest.importorskip("flask")
+    routes = pytest.importorskip("api.routes.transcription")
+
+    full_queue = JobQueue(max_workers=1, max_pending=1)
+    release = threading.Event()
+    full_queue.submit(blocking_job(threading.Event(), release))
+    monkeypatch.setattr(routes, 'transcription_queue', full_queue)
+    monkeypatch.setattr(routes, 'OUTPUT_DIR', tmp_path)
+
+    app = flask.Flask(__name__)
+    app.register_blueprint(routes.transcription_bp, url_prefix='/api')
+    try:
+        response = app.test_client().post(
+            '/api/transcribe',
+            data={'file': (io.BytesIO(b'zip bytes'), 'call.zip')},
+            content_type='multipart/form-data'
+        )
+    finally:
+        release.set()
+
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Transcription queue is full'
+    # The rejected upload is not left behind in the output directory
+    assert list(tmp_path.iterdir()) == []
+
+
+def record_runs(monkeypatch, pipeline, call_names):
+    """Replace the pipeline body with one that records when each upload held the folder"""
+    runs = []
+    runs_lock = threading.Lock()
+
+    def fake_run(upload_path, output_dir, transcriber, progress, cache):
+        start = time.monotonic()
+        time.sleep(0.2)
+        with runs_lock:
+            runs.append((upload_path, start, time.monotonic()))
+        return call_names[upload_path]
+
+    monkeypatch.setattr(pipeline, 'read_call_name', lambda upload_path: call_names[upload_path])
+    monkeypatch.setattr(pipeline, '_run_pipeline', fake_run)
+    return runs
+
+
+def test_uploads_of_the_same_call_run_one_after_the_other(monkeypatch):
+    pipeline = pytest.importorskip("api.services.transcription_pipeline.pipeline")
+    call_names = {'first.zip': '20251017_123101_bjones', 'second.zip': '20251017_123101_bjones'}
+    runs = record_runs(monkeypatch, pipeline, call_names)
+
+    queue = JobQueue(max_workers=2)
+    jobs = [queue.submit(pipeline.run_pipeline, upload, 'output', None) for upload in call_names]
+    wait_until(lambda: all(job.done for job in jobs))
+
+    assert [job.state for job in jobs] == ['completed', 'completed']
+    (_, first_start, first_end), (_, second_start, _) = sorted(runs, key=lambda run: run[1])
+    assert second_start >= first_end > first_start
+
+
+def test_uploads_of_different_calls_run_concurrently(monkeypatch):
+    pipeline = pytest.importorskip("api.services.transcription_pipeline.pipeline")
+    call_names = {'first.zip': '20251017_123101_bjones', 'second.zip': '20251017_140512_asmith'}
+    assert pipeline._folder_lock(call_names['first.zip']) is not pipeline._folder_lock(call_names['second.zip'])
+    runs = record_runs(monkeypatch, pipeline, call_names)
+
+    queue = JobQueue(max_workers=2)
+    jobs = [queue.submit(pipeline.run_pipeline, upload, 'output', None) for upload in call_names]
+    wait_until(lambda: all(job.done for job in jobs))
+
+    assert [job.state for job in jobs] == ['completed', 'completed']
+    (_, _, first_end), (_, second_start, _) = sorted(runs, key=lambda run: run[1])
+    assert second_start < first_end
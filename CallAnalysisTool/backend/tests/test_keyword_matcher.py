@@ -0,0 +1,77 @@
+"""KeywordMatcher must find exactly the keywords the old per-keyword re.search did."""
+
+import json
+import random
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")  # detect_naturecode imports numpy
+
+from detect_naturecode import KEYWORDS_PATH, KeywordMatcher
+
+TESTS_DIR = Path(__file__).resolve().parent
+
+
+def reference_hits(keywords_by_nature, text):
+    """The matching KeywordMatcher replaced: every keyword searched on every line."""
+    hits = defaultdict(set)
+    for line in text.split("\n"):
+        line = line.strip().lower()
+        if not line:
+            continue
+        for nature, keywords in keywords_by_nature.items():
+            for kw in keywords:
+                kw_low = kw.lower()
+                if re.search(rf"\b{re.escape(kw_low)}\b", line):
+                    hits[nature].add(kw_low)
+    return dict(hits)
+
+
+@pytest.fixture(scope="module")
+def keywords():
+    with open(KEYWORDS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
+def test_every_keyword_matches_itself(keywords, matcher):
+    for nature, kws in keywords.items():
+        for kw in kws:
+            text = f"caller said {kw} just now"
+            assert dict(matcher.hits_by_nature(text)) == reference_hits(keywords, text), kw
+
+
+def test_sample_transcript(keywords, matcher):
+    segments = json.loads((TESTS_DIR / "test_transcript.json").read_text(encoding="utf-8"))["segments"]
+    text = "\n".join(seg["text"] for seg in segments)
+    assert dict(matcher.hits_by_nature(text)) == reference_hits(keywords, text)
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "CHEST PAIN!!",
+    "not\nbreathing",               # a multi-word keyword split across lines
+    "not  breathing",               # two spaces
+    "not-breathing, unconscious.",
+    "painful unbreathing",          # keywords inside longer words
+    "she's having a seizure's",
+])
+def test_edge_cases(keywords, matcher, text):
+    assert dict(matcher.hits_by_nature(text)) == reference_hits(keywords, text)
+
+
+def test_random_text_from_keyword_vocabulary(keywords, matcher):
+    rng = random.Random(20251017)
+    vocabulary = sorted({word for kws in keywords.values() for kw in kws for word in kw.lower().split()})
+    vocabulary += ["the", "a", "is", "he's", "not", "911"]
+    separators = [" ", " ", " ", "  ", ", ", ". ", "\n", "-", "'"]
+    for _ in range(300):
+        text = "".join(rng.choice(vocabulary) + rng.choice(separators) for _ in range(rng.randint(1, 40)))
+        assert dict(matcher.hits_by_nature(text)) == reference_hits(keywords, text), text
@@ -0,0 +1,72 @@
+"""TimelineMap: remapping compact (speech-only) timestamps and splitting segments at cuts."""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from api.services.transcription_pipeline.vad_prepass import SAMPLE_RATE, TimelineMap
+
+
+def timeline(*regions_s):
+    return TimelineMap([(int(start * SAMPLE_RATE), int(end * SAMPLE_RATE)) for start, end in regions_s])
+
+
+def spans(segments):
+    return [(seg['start'], seg['end'], seg['text']) for seg in segments]
+
+
+def test_nothing_cut_is_identity():
+    tl = timeline((0, 10))
+    segments = [{'start': 0.5, 'end': 3.25, 'text': ' hello there'},
+                {'start': 4.0, 'end': 9.5, 'text': ' what is the address',
+                 'words': [{'word': 'what', 'start': 4.0, 'end': 4.3}]}]
+    assert tl.kept_seconds == 10
+    assert tl.split_at_cuts(segments) == segments
+    mapped = tl.map_segments(segments)
+    assert spans(mapped) == spans(segments)
+    assert mapped[1]['words'] == segments[1]['words']
+
+
+def test_segment_crossing_one_cut():
+    tl = timeline((0, 2), (5, 7))   # compact: [0, 2] [2, 4]
+    mapped = tl.map_segments([{'start': 1.0, 'end': 3.0, 'text': ' one two three four'}])
+    assert spans(mapped) == [(1.0, 2.0, ' one two'), (5.0, 6.0, ' three four')]
+
+
+def test_segment_crossing_several_cuts():
+    tl = timeline((0, 1), (3, 4), (6, 7))   # compact: [0, 1] [1, 2] [2, 3]
+    mapped = tl.map_segments([{'start': 0.5, 'end': 2.5, 'text': 'a b c d e f'}])
+    assert spans(mapped) == [(0.5, 1.0, ' a b'), (3.0, 4.0, ' c d'), (6.0, 6.5, ' e f')]
+    # No piece spans removed audio
+    for seg in mapped:
+        assert any(start <= seg['start'] and seg['end'] <= end for start, end in ((0, 1), (3, 4), (6, 7)))
+
+
+def test_piece_without_words_is_dropped():
+    tl = timeline((0, 2), (5, 7))
+    mapped = tl.map_segments([{'start': 1.9, 'end': 3.0, 'text': ' not breathing'}])
+    assert spans(mapped) == [(5.0, 6.0, ' not breathing')]
+
+
+def test_single_word_segment_is_not_split():
+    tl = timeline((0, 2), (5, 7))
+    mapped = tl.map_segments([{'start': 1.5, 'end': 2.5, 'text': ' hello'}])
+    assert spans(mapped) == [(1.5, 5.5, ' hello')]
+
+
+def test_times_on_a_cut_boundary():
+    tl = timeline((0, 2), (5, 7))
+    # A start on the boundary belongs to the later region, an end to the earlier one
+    assert float(tl.to_original(2.0)) == 5.0
+    assert float(tl.to_original(2.0, is_end=True)) == 2.0
+
+
+def test_words_on_a_cut_boundary():
+    tl = timeline((0, 2), (5, 7))
+    # Aligned segments (with words) are mapped word by word, not split
+    segment = {'start': 1.0, 'end': 3.0, 'text': ' one two',
+               'words': [{'word': 'one', 'start': 1.0, 'end': 2.0}, {'word': 'two', 'start': 2.0, 'end': 3.0}]}
+    mapped = tl.map_segments([segment])
+    assert len(mapped) == 1
+    assert (mapped[0]['start'], mapped[0]['end']) == (1.0, 6.0)
+    assert [(w['start'], w['end']) for w in mapped[0]['words']] == [(1.0, 2.0), (5.0, 6.0)]
@@ -2,7 +2,11 @@
 import React, { useState, useRef } from "react";
 import { Dispatcher } from "@/types/dispatcher";
 import { v4 as uuidv4 } from "uuid";
-import { uploadFileForAnalysis, calculateGrade } from "@/lib/api";
+import {
+  uploadFileForAnalysis,
+  calculateGrade,
+  waitForTranscriptionJob,
+} from "@/lib/api";
 import ProgressModal from "./ProgressModal";
 import { useRouter } from "next/navigation";
 
@@ -110,7 +114,20 @@ const UploadFileContainer = () => {
         );
         const transcriptionResult = await transcriptionResponse.json();
         console.log(transcriptionResult);
-        const foldername = transcriptionResult.foldername;
+
+        if (!transcriptionResponse.ok) {
+          throw new Error(
+            transcriptionResult.message ||
+              transcriptionResult.error ||
+              `Failed to queue transcription: ${transcriptionResponse.statusText}`
+          );
+        }
+
+        // Transcription runs in the background, poll the job until it finishes
+        const foldername = await waitForTranscriptionJob(
+          transcriptionResult.job_id,
+          (jobProgress) => setProgressPercentage(Math.round(jobProgress / 2))
+        );
 
         setProgressPercentage(50);
         setUploadProgress("Transcription complete! Grading transcription...");
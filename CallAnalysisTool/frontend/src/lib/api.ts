@@ -78,6 +78,53 @@ export async function uploadFileForAnalysis(file: File): Promise<ApiResponse> {
   }
 }
 
+export interface TranscriptionJob {
+  job_id: string;
+  state: "queued" | "running" | "completed" | "failed";
+  progress: number;
+  stages: {
+    [stage: string]: {
+      status: string;
+      started_at: string | null;
+      finished_at: string | null;
+    };
+  };
+  foldername: string | null;
+  file_path: string | null;
+  error: string | null;
+}
+
+/**
+ * Poll a transcription job queued by /api/transcribe until it finishes
+ * Returns the foldername of the finished transcription
+ */
+export async function waitForTranscriptionJob(
+  jobId: string,
+  onProgress?: (progress: number, job: TranscriptionJob) => void,
+  pollIntervalMs = 2000
+): Promise<string> {
+  while (true) {
+    const response = await fetch(`${API_BASE_URL}/api/jobs/${jobId}`);
+    if (!response.ok) {
+      throw new Error(
+        `Failed to get transcription job status (${response.status}): ${response.statusText}`
+      );
+    }
+
+    const job: TranscriptionJob = await response.json();
+    onProgress?.(job.progress, job);
+
+    if (job.state === "completed" && job.foldername) {
+      return job.foldername;
+    }
+    if (job.state === "failed") {
+      throw new Error(`Transcription failed: ${job.error ?? "unknown error"}`);
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, pollIntervalMs));
+  }
+}
+
 /**
  * Calculate a grade from the API response
  * Simply returns the grade_percentage that the backend already calculated